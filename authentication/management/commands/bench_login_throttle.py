@@ -0,0 +1,109 @@
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory, override_settings
+
+from authentication.views import LoginView
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure successful logins per second for legitimate users while the login endpoint "
+        "is under a credential-stuffing attack, with and without throttling. "
+        "Creates temporary users and removes them afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=60.0, help="Seconds per scenario (the login limits are per minute).")
+        parser.add_argument('--attackers', type=int, default=16,
+                            help="Concurrent attacking clients.")
+        parser.add_argument('--attack-rate', type=float, default=20.0,
+                            help="Attack requests per second offered, across all attackers.")
+        parser.add_argument('--attack-ips', type=int, default=1, help="Distinct IPs the attack comes from.")
+        parser.add_argument('--users', type=int, default=200, help="Legitimate accounts to log in with.")
+
+    def handle(self, *args, **options):
+        prefix = f'bench-{uuid.uuid4().hex[:8]}'
+        password = uuid.uuid4().hex
+        password_hash = make_password(password)
+        User.objects.bulk_create([
+            User(username=f'{prefix}-{i}@example.com', email=f'{prefix}-{i}@example.com', password=password_hash)
+            for i in range(options['users'])
+        ])
+        emails = [f'{prefix}-{i}@example.com' for i in range(options['users'])]
+
+        try:
+            with tempfile.TemporaryDirectory() as throttle_dir:
+                for label, throttle_classes in (('without throttling', []), ('with throttling', LoginView.throttle_classes)):
+                    with override_settings(THROTTLE_DB_PATH=os.path.join(throttle_dir, f'{len(throttle_classes)}.sqlite3')):
+                        results = self._run(LoginView.as_view(throttle_classes=throttle_classes), emails, password, options)
+                    self.stdout.write(
+                        f"{label:20} legitimate: {results['legit_ok'] / options['duration']:7.2f} logins/s "
+                        f"(p50 {results['legit_p50'] * 1000:7.1f} ms)  "
+                        f"attack: {results['attack_total'] / options['duration']:8.1f} req/s, "
+                        f"{results['attack_rejected']} rejected with 429"
+                    )
+        finally:
+            User.objects.filter(username__startswith=prefix).delete()
+
+    def _run(self, view, emails, password, options):
+        factory = RequestFactory()
+        stop = threading.Event()
+        results = {'legit_ok': 0, 'legit_times': [], 'attack_total': 0, 'attack_rejected': 0}
+        lock = threading.Lock()
+
+        def login(email, secret, ip):
+            request = factory.post('/api/auth/login/', {'email': email, 'password': secret},
+                                   content_type='application/json', REMOTE_ADDR=ip)
+            return view(request).status_code
+
+        def attacker(number):
+            ip = f'203.0.113.{number % options["attack_ips"] + 1}'
+            # Remote clients send at a fixed pace, whether or not they get throttled
+            interval = options['attackers'] / options['attack_rate']
+            next_send = time.perf_counter()
+            try:
+                while not stop.is_set():
+                    next_send += interval
+                    stop.wait(max(0.0, next_send - time.perf_counter()))
+                    status_code = login(f'{uuid.uuid4().hex[:10]}@example.com', 'password123', ip)
+                    with lock:
+                        results['attack_total'] += 1
+                        results['attack_rejected'] += status_code == 429
+            finally:
+                connection.close()
+
+        def legitimate_user():
+            attempt = 0
+            try:
+                while not stop.is_set():
+                    start = time.perf_counter()
+                    status_code = login(emails[attempt % len(emails)], password, f'198.51.100.{attempt % 250 + 1}')
+                    with lock:
+                        results['legit_times'].append(time.perf_counter() - start)
+                        results['legit_ok'] += status_code == 200
+                    attempt += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=attacker, args=(i,)) for i in range(options['attackers'])]
+        threads.append(threading.Thread(target=legitimate_user))
+        for thread in threads:
+            thread.start()
+        time.sleep(options['duration'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        times = sorted(results['legit_times']) or [0.0]
+        results['legit_p50'] = times[len(times) // 2]
+        return results
@@ -0,0 +1,77 @@
+"""
+Token buckets kept in a SQLite database in WAL mode, shared by every worker
+process on the host. Each check is one short write transaction, so concurrent
+requests can never both take the last token.
+"""
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+
+STALE_AFTER = 24 * 60 * 60  # Buckets untouched this long are deleted
+CLEANUP_PROBABILITY = 0.001
+
+
+class SQLiteTokenBuckets:
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+            )
+            self._local.connection = connection
+        return connection
+
+    def consume(self, key, capacity, refill_rate, now=None):
+        """
+        Take one token from the bucket ``key`` holding up to ``capacity``
+        tokens and refilled at ``refill_rate`` tokens per second.
+
+        Returns ``(allowed, wait)``, ``wait`` being the seconds until a token is available.
+        """
+        now = time.time() if now is None else now
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT tokens, updated FROM bucket WHERE key = ?', (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * refill_rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            connection.execute(
+                'INSERT INTO bucket (key, tokens, updated) VALUES (?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated',
+                (key, tokens, now),
+            )
+            if random.random() < CLEANUP_PROBABILITY:
+                connection.execute('DELETE FROM bucket WHERE updated < ?', (now - STALE_AFTER,))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return allowed, 0.0 if allowed else (1 - tokens) / refill_rate
+
+
+_buckets = {}
+
+
+def get_buckets():
+    """
+    Return the token bucket store for ``settings.THROTTLE_DB_PATH`` in this process.
+    """
+    key = (os.getpid(), str(settings.THROTTLE_DB_PATH))
+    buckets = _buckets.get(key)
+    if buckets is None:
+        buckets = _buckets[key] = SQLiteTokenBuckets(settings.THROTTLE_DB_PATH)
+    return buckets
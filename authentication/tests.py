@@ -1,3 +1,53 @@
-from django.test import TestCase
+import tempfile
+import uuid
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .throttling import SharedScopedRateThrottle
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoginThrottleTests(TestCase):
+
+    def setUp(self):
+        throttle_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(throttle_dir.cleanup)
+        settings_override = override_settings(THROTTLE_DB_PATH=f'{throttle_dir.name}/throttle.sqlite3')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Rates are read once at import time by DRF, so patch them rather than the settings
+        rates = mock.patch.object(
+            SharedScopedRateThrottle, 'THROTTLE_RATES', {'login_ip': '5/hour', 'login_email': '5/hour'}
+        )
+        rates.start()
+        self.addCleanup(rates.stop)
+        self.client = APIClient()
+
+    def attempt(self, **extra):
+        # A new email every time, as in credential stuffing, so only the IP bucket applies
+        data = {'email': f'{uuid.uuid4().hex[:10]}@example.com', 'password': 'password123'}
+        return self.client.post(reverse('login'), data, format='json', **extra)
+
+    def test_spoofed_forwarded_for_does_not_reset_ip_bucket(self):
+        status_codes = [
+            self.attempt(REMOTE_ADDR='203.0.113.7', HTTP_X_FORWARDED_FOR=f'10.0.0.{i}').status_code
+            for i in range(8)
+        ]
+        self.assertNotIn(429, status_codes[:5])
+        self.assertEqual(status_codes[5:], [429] * 3)
+
+    def test_proxy_hop_is_trusted_when_configured(self):
+        with self.settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            # The proxy appends the real client address; whatever the client sent before it is ignored
+            status_codes = [
+                self.attempt(REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=f'10.1.0.{i}, 203.0.113.7').status_code
+                for i in range(6)
+            ]
+            self.assertEqual(status_codes[-1], 429)
+            # Another client behind the same proxy has its own bucket
+            response = self.attempt(REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='198.51.100.4')
+            self.assertNotEqual(response.status_code, 429)
@@ -0,0 +1,67 @@
+from rest_framework.throttling import SimpleRateThrottle
+
+from .ratelimit import get_buckets
+
+
+class SharedScopedRateThrottle(SimpleRateThrottle):
+    """
+    Token bucket throttle backed by the SQLite store in ``authentication.ratelimit``,
+    which is shared by all worker processes.
+
+    The rate comes from ``DEFAULT_THROTTLE_RATES['<view.throttle_scope>_<scope_suffix>']``:
+    '10/min' allows a burst of 10, refilled at 10 per minute.
+    Views without a ``throttle_scope`` are not throttled.
+    """
+    scope_suffix = None
+
+    def __init__(self):
+        # The rate depends on the view, so it is resolved in allow_request()
+        self.wait_seconds = None
+
+    def allow_request(self, request, view):
+        view_scope = getattr(view, 'throttle_scope', None)
+        if not view_scope:
+            return True
+        self.scope = f'{view_scope}_{self.scope_suffix}'
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        if self.rate is None:
+            return True
+
+        ident = self.get_scope_ident(request)
+        if ident is None:
+            return True
+        key = self.cache_format % {'scope': self.scope, 'ident': ident}
+        allowed, self.wait_seconds = get_buckets().consume(
+            key, self.num_requests, self.num_requests / self.duration
+        )
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+    def get_scope_ident(self, request):
+        raise NotImplementedError
+
+
+class IPRateThrottle(SharedScopedRateThrottle):
+    """
+    Limits attempts per client IP, as trusted through ``REST_FRAMEWORK['NUM_PROXIES']``.
+    """
+    scope_suffix = 'ip'
+
+    def get_scope_ident(self, request):
+        return self.get_ident(request)
+
+
+class EmailRateThrottle(SharedScopedRateThrottle):
+    """
+    Limits attempts per email address in the request body, whatever the IP.
+    """
+    scope_suffix = 'email'
+
+    def get_scope_ident(self, request):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        if not isinstance(email, str) or not email.strip():
+            return None
+        return email.strip().lower()
@@ -8,6 +8,7 @@ from drf_spectacular.utils import extend_schema
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
 from rest_framework.exceptions import ValidationError
+from .throttling import IPRateThrottle, EmailRateThrottle
 from .serializers import (
     RegisterSerializer,
     LoginSerializer,
@@ -19,12 +20,15 @@ User = get_user_model()
 
 class RegisterView(APIView):
     permission_classes = [AllowAny]  # No authentication required for registration
+    throttle_classes = [IPRateThrottle, EmailRateThrottle]
+    throttle_scope = 'register'
 
     @extend_schema(
         request=RegisterSerializer,
         responses={
             201: {"type": "object", "properties": {"token": {"type": "string"}}},
             400: {"description": "Validation errors"},
+            429: {"description": "Too many attempts"},
         },
     )
     def post(self, request):
@@ -38,12 +42,15 @@ class RegisterView(APIView):
 
 class LoginView(APIView):
     permission_classes = [AllowAny]  # No authentication required for login
+    throttle_classes = [IPRateThrottle, EmailRateThrottle]  # Checked before the password is hashed
+    throttle_scope = 'login'
 
     @extend_schema(
         request=LoginSerializer,
         responses={
             200: {"type": "object", "properties": {"token": {"type": "string"}}},
             400: {"description": "Invalid credentials"},
+            429: {"description": "Too many attempts"},
         },
     )
     def post(self, request):
@@ -77,12 +84,15 @@ class LogoutView(APIView):
 
 class PasswordResetView(APIView):
     permission_classes = [AllowAny]  # No authentication required for password reset
+    throttle_classes = [IPRateThrottle, EmailRateThrottle]
+    throttle_scope = 'password_reset'
 
     @extend_schema(
         request=PasswordResetSerializer,
         responses={
             200: {"description": "Password reset email sent."},
             400: {"description": "Validation errors"},
+            429: {"description": "Too many attempts"},
         },
     )
     def post(self, request):
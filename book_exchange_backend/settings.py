@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,10 +48,13 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework.authtoken',  # For token-based authentication
     'authentication',
-    'books'
+    'books',
+    'metrics',
+    'schema',
 ]
 
 MIDDLEWARE = [ 
+    'metrics.middleware.MetricsMiddleware',  # Keep first so it times the whole stack
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -89,6 +93,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Take the write lock when a transaction begins: Book.save() reads the row
+        # before writing (see books.signals), which deadlocks deferred transactions
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
     }
 }
 
@@ -100,9 +107,27 @@ REST_FRAMEWORK = {
          'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Reverse proxies in front of the app. The client IP used by the throttles is
+    # taken from the X-Forwarded-For entry appended by the outermost of them, or
+    # from REMOTE_ADDR when there are none; entries sent by the client are ignored.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+    # Used by the login/register/password-reset throttles (authentication.throttling)
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '30/min',
+        'login_email': '10/min',
+        'register_ip': '10/hour',
+        'register_email': '5/hour',
+        'password_reset_ip': '10/hour',
+        'password_reset_email': '3/hour',
+    },
 }
 
 
+# Token buckets of the login/register/password-reset throttles, shared by all
+# worker processes on the host (see authentication.ratelimit).
+THROTTLE_DB_PATH = os.environ.get('THROTTLE_DB_PATH', BASE_DIR / '.throttle.sqlite3')
+
+
 CORS_ALLOW_ALL_ORIGINS = True  # Allow requests from any origin
 
 
@@ -150,4 +175,27 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend' 
 
+# Directory holding the per-process metric files aggregated by /metrics.
+# Must be shared by all worker processes and emptied on every deploy.
+METRICS_DIR = os.environ.get('METRICS_DIR', BASE_DIR / '.metrics')
+
+# Who may read /metrics: clients connecting from these addresses (REMOTE_ADDR,
+# comma separated in the environment), or sending "Authorization: Bearer <METRICS_TOKEN>".
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if ip.strip()]
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Precomputed OpenAPI schemas, one file per code version (see schema.cache).
+# SCHEMA_VERSION can pin the version, e.g. to the deployed git revision.
+SCHEMA_CACHE_DIR = BASE_DIR / '.schema_cache'
+SCHEMA_VERSION = os.environ.get('SCHEMA_VERSION')
+
+# Seconds before a worker rebuilds its title/author autocomplete index from the
+# database, in the background, to pick up books written by other workers
+# (see books.autocomplete).
+AUTOCOMPLETE_MAX_AGE = 300
+
+# Accepted/rejected exchange requests older than this many days are moved to the
+# archive table by `manage.py archive_exchange_requests`.
+EXCHANGE_REQUEST_ARCHIVE_DAYS = 90
+
 
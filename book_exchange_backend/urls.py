@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.urls import path, include
-from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView
+from drf_spectacular.views import SpectacularRedocView
+from metrics.views import metrics_view
+from schema.views import CachedSchemaView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -8,9 +10,12 @@ urlpatterns = [
     path('api/', include('books.urls')),
     
     
-    # Schema generation endpoint
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
+    # Schema endpoint, served from the precomputed schema (manage.py build_schema)
+    path('api/schema/', CachedSchemaView.as_view(), name='schema'),
 
     # ReDoc documentation endpoint
     path('api/docs/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
+
+    # Prometheus metrics, aggregated across worker processes
+    path('metrics', metrics_view, name='metrics'),
 ]
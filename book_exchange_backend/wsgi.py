@@ -14,3 +14,13 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'book_exchange_backend.settings')
 
 application = get_wsgi_application()
+
+# Load (or build) the OpenAPI schema and the autocomplete index now rather than
+# on the first request, then close the connection used for it, so workers forked
+# from this process (e.g. gunicorn --preload) do not share it.
+from django.db import connections  # noqa: E402
+from schema.cache import warm  # noqa: E402
+from books.autocomplete import book_autocomplete  # noqa: E402
+warm()
+book_autocomplete.rebuild()
+connections.close_all()
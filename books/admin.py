@@ -1,10 +1,142 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
 
-from .models import Book, ExchangeRequest
+from .models import ArchivedExchangeRequest, Book, ExchangeRequest, Work
+from .utils import normalize_text
 
 
 # Register your models here.
 
 
-admin.site.register(Book)
-admin.site.register(ExchangeRequest)
\ No newline at end of file
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses a cheap row estimate instead of COUNT(*) for
+    unfiltered changelists over large tables, and stops counting filtered
+    ones after ``filtered_count_limit`` rows.
+    """
+    exact_count_threshold = 10000  # Smaller tables are counted exactly
+    filtered_count_limit = 100000  # Filtered views page through at most this many rows
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        if not query.where:
+            estimate = self._estimate(self.object_list.model, self.object_list.db)
+            if estimate > self.exact_count_threshold:
+                return estimate
+            return super().count
+        # COUNT(*) over a LIMIT subquery, so a broad filter cannot scan the whole table
+        return self.object_list.order_by()[:self.filtered_count_limit].count()
+
+    def _estimate(self, model, using):
+        if connections[using].vendor == 'postgresql':
+            with connections[using].cursor() as cursor:
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [model._meta.db_table])
+                row = cursor.fetchone()
+            return row[0] if row else 0
+        # Highest id, read from the primary key index; rows are rarely deleted
+        return model._default_manager.using(using).aggregate(highest=Max('pk'))['highest'] or 0
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # Avoids a second COUNT(*) when searching or filtering
+    ordering = ('-id',)
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Search on indexed columns only: an exact id, or whatever ``search_filter`` returns.
+        """
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        if search_term.isdigit():
+            return queryset.filter(pk=int(search_term)), False
+        return queryset.filter(self.search_filter(search_term)), False
+
+    def search_filter(self, search_term):
+        raise NotImplementedError
+
+
+def prefix_range(field, value):
+    # A range rather than (i)startswith, so any B-tree index on the column can be used
+    value = normalize_text(value)
+    return Q(**{f'{field}__gte': value, f'{field}__lt': value + '\U0010ffff'})
+
+
+@admin.register(Work)
+class WorkAdmin(LargeTableAdmin):
+    list_display = ('id', 'title', 'author', 'genre', 'total_copies', 'available_copies')
+    search_fields = ('normalized_title', 'normalized_author')
+    readonly_fields = ('normalized_title', 'normalized_author', 'total_copies', 'available_copies')
+
+    def search_filter(self, search_term):
+        return prefix_range('normalized_title', search_term) | prefix_range('normalized_author', search_term)
+
+
+@admin.register(Book)
+class BookAdmin(LargeTableAdmin):
+    list_display = ('id', 'title', 'author', 'user', 'availability', 'location')
+    list_select_related = ('user',)
+    list_filter = ('availability',)
+    search_fields = ('title', 'author')
+    autocomplete_fields = ('user', 'work')
+    actions = ('mark_available', 'mark_unavailable')
+
+    def search_filter(self, search_term):
+        works = Work.objects.filter(
+            prefix_range('normalized_title', search_term) | prefix_range('normalized_author', search_term)
+        )
+        return Q(work__in=works.values('pk'))
+
+    def _set_availability(self, request, queryset, availability):
+        work_ids = set(queryset.values_list('work_id', flat=True))
+        updated = queryset.update(availability=availability)
+        # update() sends no signals, so recount the affected works here
+        Work.refresh_counters(work_ids)
+        self.message_user(request, f"{updated} books updated.")
+
+    @admin.action(description="Mark selected books as available")
+    def mark_available(self, request, queryset):
+        self._set_availability(request, queryset, True)
+
+    @admin.action(description="Mark selected books as unavailable")
+    def mark_unavailable(self, request, queryset):
+        self._set_availability(request, queryset, False)
+
+
+class ExchangeRequestAdminBase(LargeTableAdmin):
+    list_display = ('id', 'sender', 'receiver', 'book', 'status', 'created_at')
+    list_select_related = ('sender', 'receiver', 'book')
+    list_filter = ('status',)
+    search_fields = ('sender__username', 'receiver__username')
+    autocomplete_fields = ('sender', 'receiver', 'book')
+
+    def search_filter(self, search_term):
+        # username is unique, hence indexed; match it exactly
+        return Q(sender__username=search_term) | Q(receiver__username=search_term)
+
+
+@admin.register(ExchangeRequest)
+class ExchangeRequestAdmin(ExchangeRequestAdminBase):
+    actions = ('mark_accepted', 'mark_rejected')
+
+    def _set_status(self, request, queryset, status):
+        updated = queryset.update(status=status)
+        self.message_user(request, f"{updated} exchange requests marked as {status}.")
+
+    @admin.action(description="Mark selected requests as accepted")
+    def mark_accepted(self, request, queryset):
+        self._set_status(request, queryset, 'accepted')
+
+    @admin.action(description="Mark selected requests as rejected")
+    def mark_rejected(self, request, queryset):
+        self._set_status(request, queryset, 'rejected')
+
+
+@admin.register(ArchivedExchangeRequest)
+class ArchivedExchangeRequestAdmin(ExchangeRequestAdminBase):
+    list_display = ExchangeRequestAdminBase.list_display + ('archived_at',)
@@ -0,0 +1,243 @@
+"""
+In-memory prefix index of book titles and authors for typeahead suggestions.
+A query matches the start of any word, so "hob" finds "The Hobbit".
+
+Each worker process builds its index from the database at startup (see
+``wsgi.py``) and keeps it current through the ``Book`` save/delete signals.
+Writes made by other processes (or by bulk queryset updates, which send no
+signals) are picked up by a rebuild once the index is older than
+``AUTOCOMPLETE_MAX_AGE`` seconds. That rebuild runs in a background thread
+while requests keep being answered from the current index.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import connection
+
+from metrics.store import record_cache_lookup
+
+from .models import Book
+from .utils import normalize_text
+
+MAX_SUGGESTIONS = 20
+MAX_CACHED_PREFIXES = 10000
+
+
+def word_starts(key):
+    """
+    Every suffix of ``key`` that starts a word: "the hobbit" -> "the hobbit", "hobbit".
+    """
+    return [key[index:] for index in range(len(key)) if index == 0 or key[index - 1] == ' ']
+
+
+def _prefixes(key):
+    return {suffix[:end] for suffix in word_starts(key) for end in range(1, len(suffix) + 1)}
+
+
+class PrefixIndex:
+    """
+    Sorted array of the word starts of normalized strings, each pointing back
+    to its string, with a popularity count for every string.
+    """
+
+    def __init__(self, counts=None, labels=None, name='prefix_index'):
+        self.name = name  # reported as the cache name of the prefix lookups
+        self._counts = counts or {}
+        self._labels = labels or {}
+        self._entries = sorted((suffix, key) for key in self._counts for suffix in word_starts(key))
+        self._top = {}  # prefix -> most popular keys, up to MAX_SUGGESTIONS
+
+    @classmethod
+    def from_labels(cls, labels, name='prefix_index'):
+        counts = {}
+        display = {}
+        for label in labels:
+            key = normalize_text(label)
+            if key:
+                counts[key] = counts.get(key, 0) + 1
+                display.setdefault(key, label.strip())
+        return cls(counts, display, name)
+
+    def add(self, key, label):
+        if not key:
+            return
+        if key in self._counts:
+            self._counts[key] += 1
+        else:
+            for suffix in word_starts(key):
+                insort(self._entries, (suffix, key))
+            self._counts[key] = 1
+            self._labels[key] = label.strip()
+        self._promote(key)
+
+    def remove(self, key):
+        if key not in self._counts:
+            return
+        self._counts[key] -= 1
+        if not self._counts[key]:
+            for suffix in word_starts(key):
+                del self._entries[bisect_left(self._entries, (suffix, key))]
+            del self._counts[key]
+            del self._labels[key]
+        self._demote(key)
+
+    def _rank(self, key):
+        return (-self._counts[key], key)
+
+    def _promote(self, key):
+        # A count went up: the cached lists of its prefixes can be patched in place.
+        for prefix in _prefixes(key):
+            top = self._top.get(prefix)
+            if top is None:
+                continue
+            if key not in top:
+                if len(top) >= MAX_SUGGESTIONS and self._rank(key) > self._rank(top[-1]):
+                    continue
+                top.append(key)
+            top.sort(key=self._rank)
+            del top[MAX_SUGGESTIONS:]
+
+    def _demote(self, key):
+        # A count went down: a full list may now be missing a key outside of it.
+        for prefix in _prefixes(key):
+            top = self._top.get(prefix)
+            if top is None or key not in top:
+                continue
+            if len(top) >= MAX_SUGGESTIONS:
+                del self._top[prefix]
+            elif key in self._counts:
+                top.sort(key=self._rank)
+            else:
+                top.remove(key)
+
+    def _top_keys(self, prefix):
+        top = self._top.get(prefix)
+        if top is None:
+            start = bisect_left(self._entries, (prefix,))
+            end = bisect_left(self._entries, (prefix + '\U0010ffff',), start)
+            keys = {key for _, key in self._entries[start:end]}  # a key may match at several words
+            top = heapq.nsmallest(MAX_SUGGESTIONS, keys, key=self._rank)
+            if len(self._top) >= MAX_CACHED_PREFIXES:
+                self._top.clear()
+            self._top[prefix] = top
+        return top
+
+    def warm(self):
+        """
+        Precompute the widest (single character) prefixes, the slowest to scan.
+        """
+        for first in {suffix[0] for suffix, _ in self._entries}:
+            self._top_keys(first)
+
+    def suggest(self, prefix, limit):
+        """
+        Return up to ``limit`` ``{'value', 'count'}`` dicts, most popular first.
+        """
+        prefix = normalize_text(prefix)
+        if not prefix:
+            return []
+        record_cache_lookup(self.name, prefix in self._top)
+        return [{'value': self._labels[key], 'count': self._counts[key]} for key in self._top_keys(prefix)[:limit]]
+
+
+class BookAutocomplete:
+    """
+    Title and author prefix indexes over all books.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built_at = None
+        self._refreshing = False
+        self._pending = None  # book changes seen while a rebuild reads the database
+        self._books = {}  # book id -> (normalized title, normalized author)
+        self.titles = PrefixIndex(name='autocomplete_titles')
+        self.authors = PrefixIndex(name='autocomplete_authors')
+
+    def ensure_built(self):
+        if self._built_at is None:
+            # Nothing to serve yet: build inline, once
+            with self._lock:
+                if self._built_at is None:
+                    self.rebuild()
+            return
+        max_age = getattr(settings, 'AUTOCOMPLETE_MAX_AGE', 300)
+        if time.monotonic() - self._built_at > max_age and not self._refreshing:
+            with self._lock:
+                if self._refreshing:
+                    return
+                self._refreshing = True
+            threading.Thread(target=self._refresh, name='book-autocomplete-refresh', daemon=True).start()
+
+    def _refresh(self):
+        try:
+            self.rebuild()
+        finally:
+            self._refreshing = False
+            connection.close()  # this thread's own connection
+
+    def rebuild(self):
+        with self._lock:
+            self._pending = []
+        try:
+            rows = list(Book.objects.values_list('id', 'title', 'author').iterator())
+            titles = PrefixIndex.from_labels((title for _, title, _ in rows), 'autocomplete_titles')
+            authors = PrefixIndex.from_labels((author for _, _, author in rows), 'autocomplete_authors')
+            books = {pk: (normalize_text(title), normalize_text(author)) for pk, title, author in rows}
+            titles.warm()
+            authors.warm()
+            with self._lock:
+                self.titles, self.authors, self._books = titles, authors, books
+                self._built_at = time.monotonic()
+                pending, self._pending = self._pending, None
+                # Replay what changed meanwhile; changes the read already saw are no-ops
+                for book_id, labels in pending:
+                    if labels is None:
+                        self.book_deleted(book_id)
+                    else:
+                        self.book_saved(book_id, *labels)
+        finally:
+            with self._lock:
+                self._pending = None
+
+    def book_saved(self, book_id, title, author):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((book_id, (title, author)))
+            if self._built_at is None:
+                return
+            keys = (normalize_text(title), normalize_text(author))
+            old_keys = self._books.get(book_id)
+            if old_keys == keys:
+                return
+            if old_keys:
+                self.titles.remove(old_keys[0])
+                self.authors.remove(old_keys[1])
+            self.titles.add(keys[0], title)
+            self.authors.add(keys[1], author)
+            self._books[book_id] = keys
+
+    def book_deleted(self, book_id):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((book_id, None))
+            if self._built_at is None:
+                return
+            old_keys = self._books.pop(book_id, None)
+            if old_keys:
+                self.titles.remove(old_keys[0])
+                self.authors.remove(old_keys[1])
+
+    def suggest(self, prefix, limit=10):
+        self.ensure_built()
+        with self._lock:
+            return {
+                'titles': self.titles.suggest(prefix, limit),
+                'authors': self.authors.suggest(prefix, limit),
+            }
+
+
+book_autocomplete = BookAutocomplete()
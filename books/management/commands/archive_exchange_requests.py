@@ -0,0 +1,64 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from books.models import ArchivedExchangeRequest, ExchangeRequest
+
+
+class Command(BaseCommand):
+    help = (
+        "Move closed exchange requests older than the retention policy into the archive table, "
+        "in small batches. Safe to interrupt and re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.EXCHANGE_REQUEST_ARCHIVE_DAYS,
+                            help="Archive requests created more than this many days ago.")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help="Seconds to sleep between batches to leave room for live traffic.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        archivable = ExchangeRequest.objects.filter(
+            status__in=ExchangeRequest.CLOSED_STATUSES, created_at__lt=cutoff
+        )
+        moved = 0
+        last_id = 0
+        while True:
+            # One short transaction per batch: copy the rows, then delete them
+            with transaction.atomic():
+                batch = list(
+                    archivable.filter(id__gt=last_id).order_by('id')
+                    .select_for_update(skip_locked=True)[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                ArchivedExchangeRequest.objects.bulk_create(
+                    [
+                        ArchivedExchangeRequest(
+                            id=request.id,
+                            sender_id=request.sender_id,
+                            receiver_id=request.receiver_id,
+                            book_id=request.book_id,
+                            status=request.status,
+                            delivery_method=request.delivery_method,
+                            exchange_duration=request.exchange_duration,
+                            created_at=request.created_at,
+                        )
+                        for request in batch
+                    ],
+                    ignore_conflicts=True,
+                )
+                ExchangeRequest.objects.filter(id__in=[request.id for request in batch]).delete()
+            moved += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f"Archived {moved} exchange requests (up to id {last_id}).")
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(f"Done, {moved} exchange requests archived."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from books.recommendations import refresh_recommendations
+
+
+class Command(BaseCommand):
+    help = "Refresh the precomputed book recommendations of users affected by new exchange requests."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Recompute every user instead of only those affected by new activity.")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = refresh_recommendations(full=options['full'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Updated recommendations for {count} users."))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from books.models import Work
+
+
+class Command(BaseCommand):
+    help = "Recount the copy counters of every Work (and per location) from the books table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Works recounted per transaction.")
+
+    def handle(self, *args, **options):
+        last_id = 0
+        count = 0
+        while True:
+            work_ids = list(
+                Work.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not work_ids:
+                break
+            Work.refresh_counters(work_ids)
+            count += len(work_ids)
+            last_id = work_ids[-1]
+        self.stdout.write(self.style.SUCCESS(f"Recounted {count} works."))
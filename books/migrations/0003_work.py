@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0002_exchangerequest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Work',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('normalized_title', models.CharField(max_length=255)),
+                ('normalized_author', models.CharField(max_length=255)),
+                ('title', models.CharField(max_length=255)),
+                ('author', models.CharField(max_length=255)),
+                ('genre', models.CharField(max_length=100)),
+                ('total_copies', models.PositiveIntegerField(default=0)),
+                ('available_copies', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['normalized_author'], name='books_work_normali_8b476f_idx'), models.Index(fields=['-available_copies'], name='books_work_availab_cc7e5d_idx')],
+                'constraints': [models.UniqueConstraint(fields=('normalized_title', 'normalized_author'), name='unique_work')],
+            },
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='work',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='books', to='books.work'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+from django.db import migrations, transaction
+from django.db.models import Count, Q
+
+from books.utils import normalize_text
+
+BATCH_SIZE = 1000
+
+
+def backfill_works(apps, schema_editor):
+    """
+    Link every book to its Work in batches of BATCH_SIZE, one short transaction
+    each, then recount the copies of every Work. Safe to re-run.
+    """
+    Book = apps.get_model('books', 'Book')
+    Work = apps.get_model('books', 'Work')
+
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            books = list(
+                Book.objects.filter(id__gt=last_id, work__isnull=True)
+                .order_by('id')
+                .only('id', 'title', 'author', 'genre')[:BATCH_SIZE]
+            )
+            if not books:
+                break
+            keys = {}
+            for book in books:
+                key = (normalize_text(book.title), normalize_text(book.author))
+                keys.setdefault(key, book)
+            Work.objects.bulk_create(
+                [
+                    Work(normalized_title=title, normalized_author=author,
+                         title=book.title, author=book.author, genre=book.genre)
+                    for (title, author), book in keys.items()
+                ],
+                ignore_conflicts=True,
+            )
+            works = {}
+            for work in Work.objects.filter(normalized_title__in={title for title, _ in keys}):
+                works[(work.normalized_title, work.normalized_author)] = work.id
+            for book in books:
+                book.work_id = works[(normalize_text(book.title), normalize_text(book.author))]
+            Book.objects.bulk_update(books, ['work'])
+            last_id = books[-1].id
+
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            works = list(
+                Work.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .annotate(
+                    book_count=Count('books'),
+                    available_count=Count('books', filter=Q(books__availability=True)),
+                )[:BATCH_SIZE]
+            )
+            if not works:
+                break
+            for work in works:
+                work.total_copies = work.book_count
+                work.available_copies = work.available_count
+            Work.objects.bulk_update(works, ['total_copies', 'available_copies'])
+            last_id = works[-1].id
+
+
+class Migration(migrations.Migration):
+    atomic = False  # Each batch commits on its own, so no lock is held for the whole table
+
+    dependencies = [
+        ('books', '0003_work'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_works, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0006_archivedexchangerequest'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['availability', '-id'], name='books_book_availab_4570b4_idx'),
+        ),
+    ]
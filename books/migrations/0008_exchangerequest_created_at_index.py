@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0007_book_availability_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='exchangerequest',
+            index=models.Index(fields=['created_at'], name='books_excha_created_d51299_idx'),
+        ),
+    ]
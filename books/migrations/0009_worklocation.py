@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0008_exchangerequest_created_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(max_length=255)),
+                ('available_copies', models.PositiveIntegerField(default=0)),
+                ('work', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='locations', to='books.work')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['location', '-available_copies'], name='books_workl_locatio_1c0f01_idx')],
+                'constraints': [models.UniqueConstraint(fields=('work', 'location'), name='unique_work_location')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+from collections import Counter
+
+from django.db import migrations, transaction
+
+from books.utils import normalize_text
+
+BATCH_SIZE = 1000
+
+
+def backfill_work_locations(apps, schema_editor):
+    """
+    Count the available copies of every Work per location, BATCH_SIZE works
+    at a time, one short transaction each. Safe to re-run.
+    """
+    Book = apps.get_model('books', 'Book')
+    Work = apps.get_model('books', 'Work')
+    WorkLocation = apps.get_model('books', 'WorkLocation')
+
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            work_ids = list(Work.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:BATCH_SIZE])
+            if not work_ids:
+                break
+            located = Counter(
+                (work_id, normalize_text(location))
+                for work_id, location in Book.objects.filter(work_id__in=work_ids, availability=True)
+                .values_list('work_id', 'location')
+            )
+            WorkLocation.objects.filter(work_id__in=work_ids).delete()
+            WorkLocation.objects.bulk_create([
+                WorkLocation(work_id=work_id, location=location, available_copies=count)
+                for (work_id, location), count in located.items()
+            ])
+            last_id = work_ids[-1]
+
+
+class Migration(migrations.Migration):
+    atomic = False  # Each batch commits on its own, so no lock is held for the whole table
+
+    dependencies = [
+        ('books', '0009_worklocation'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_work_locations, migrations.RunPython.noop),
+    ]
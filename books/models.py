@@ -1,6 +1,113 @@
-from django.db import models
+from collections import Counter
+
+from django.db import models, transaction
+from django.db.models import Count, F, Q
 from django.contrib.auth.models import User
 
+from .utils import normalize_text
+
+
+# Canonical title/author pair shared by every copy of the same book
+class Work(models.Model):
+    normalized_title = models.CharField(max_length=255)
+    normalized_author = models.CharField(max_length=255)
+    title = models.CharField(max_length=255)
+    author = models.CharField(max_length=255)
+    genre = models.CharField(max_length=100)
+    total_copies = models.PositiveIntegerField(default=0)  # Kept current by books.signals
+    available_copies = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['normalized_title', 'normalized_author'], name='unique_work'),
+        ]
+        indexes = [
+            models.Index(fields=['normalized_author']),
+            models.Index(fields=['-available_copies']),
+        ]
+
+    def __str__(self):
+        return f"{self.title} by {self.author}"
+
+    @classmethod
+    def for_book(cls, book):
+        """
+        Return the Work matching the book's title and author, creating it if needed.
+        """
+        normalized_title = normalize_text(book.title)
+        normalized_author = normalize_text(book.author)
+        work = book.work if book.work_id else None
+        if work and (work.normalized_title, work.normalized_author) == (normalized_title, normalized_author):
+            return work
+        work, created = cls.objects.get_or_create(
+            normalized_title=normalized_title,
+            normalized_author=normalized_author,
+            defaults={'title': book.title, 'author': book.author, 'genre': book.genre},
+        )
+        return work
+
+    @classmethod
+    def adjust_counters(cls, work_id, total, available):
+        cls.objects.filter(pk=work_id).update(
+            total_copies=F('total_copies') + total,
+            available_copies=F('available_copies') + available,
+        )
+
+    @classmethod
+    def refresh_counters(cls, work_ids):
+        """
+        Recount copies, overall and per location, from the books table, e.g.
+        after a bulk queryset update.
+        """
+        work_ids = list(work_ids)
+        with transaction.atomic():
+            works = cls.objects.filter(pk__in=work_ids).annotate(
+                book_count=Count('books'),
+                available_count=Count('books', filter=Q(books__availability=True)),
+            )
+            for work in works:
+                work.total_copies = work.book_count
+                work.available_copies = work.available_count
+            cls.objects.bulk_update(works, ['total_copies', 'available_copies'])
+
+            located = Counter(
+                (work_id, normalize_text(location))
+                for work_id, location in Book.objects.filter(work_id__in=work_ids, availability=True)
+                .values_list('work_id', 'location')
+            )
+            WorkLocation.objects.filter(work_id__in=work_ids).delete()
+            WorkLocation.objects.bulk_create([
+                WorkLocation(work_id=work_id, location=location, available_copies=count)
+                for (work_id, location), count in located.items()
+            ])
+
+
+# Available copies of a Work per normalized Book.location, for "N copies available near you"
+class WorkLocation(models.Model):
+    work = models.ForeignKey(Work, related_name='locations', on_delete=models.CASCADE)
+    location = models.CharField(max_length=255)  # normalize_text(Book.location)
+    available_copies = models.PositiveIntegerField(default=0)  # Kept current by books.signals
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['work', 'location'], name='unique_work_location'),
+        ]
+        indexes = [
+            models.Index(fields=['location', '-available_copies']),
+        ]
+
+    def __str__(self):
+        return f"{self.work_id} at {self.location}"
+
+    @classmethod
+    def adjust(cls, work_id, location, amount):
+        if amount > 0:
+            cls.objects.get_or_create(work_id=work_id, location=location)
+        cls.objects.filter(work_id=work_id, location=location).update(
+            available_copies=F('available_copies') + amount,
+        )
+
+
 class Book(models.Model):
     title = models.CharField(max_length=255)
     author = models.CharField(max_length=255)
@@ -9,9 +116,20 @@ class Book(models.Model):
     availability = models.BooleanField(default=True)  # Whether the book is available or not
     location = models.CharField(max_length=255)
     user = models.ForeignKey(User, related_name='books', on_delete=models.CASCADE)  # Associate with user
+    work = models.ForeignKey(Work, related_name='books', on_delete=models.PROTECT, null=True, blank=True)  # Set on save
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['availability', '-id']),  # Admin changelist filter, newest first
+        ]
 
     def __str__(self):
         return self.title
+
+    def save(self, *args, **kwargs):
+        # One transaction, so the row lock taken by books.signals lasts until the counters are updated
+        with transaction.atomic():
+            super().save(*args, **kwargs)
     
     
 # Model to track exchange requests
@@ -22,6 +140,7 @@ class ExchangeRequest(models.Model):
         ('rejected', 'Rejected'),
         ('modified', 'Modified'),
     ]
+    CLOSED_STATUSES = ('accepted', 'rejected')  # Archived once old enough
 
     sender = models.ForeignKey(User, related_name='sent_requests', on_delete=models.CASCADE)
     receiver = models.ForeignKey(User, related_name='received_requests', on_delete=models.CASCADE)
@@ -31,5 +150,37 @@ class ExchangeRequest(models.Model):
     exchange_duration = models.IntegerField()  # in days
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),  # Archive selection
+            models.Index(fields=['created_at']),  # New activity, for the recommendations refresh
+        ]
+
     def __str__(self):
         return f"Exchange request from {self.sender.username} to {self.receiver.username}"
+
+
+# Closed exchange requests moved out of the hot table by the archive_exchange_requests command
+class ArchivedExchangeRequest(models.Model):
+    id = models.BigIntegerField(primary_key=True)  # Same id as the original request
+    sender = models.ForeignKey(User, related_name='archived_sent_requests', on_delete=models.CASCADE)
+    receiver = models.ForeignKey(User, related_name='archived_received_requests', on_delete=models.CASCADE)
+    book = models.ForeignKey(Book, related_name='archived_exchange_requests', on_delete=models.CASCADE)
+    status = models.CharField(max_length=10, choices=ExchangeRequest.STATUS_CHOICES)
+    delivery_method = models.CharField(max_length=255)
+    exchange_duration = models.IntegerField()  # in days
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived exchange request from {self.sender.username} to {self.receiver.username}"
+
+
+# Precomputed "books you may like" for a user, see books.recommendations
+class UserRecommendations(models.Model):
+    user = models.OneToOneField(User, related_name='recommendations', on_delete=models.CASCADE, primary_key=True)
+    work_ids = models.JSONField(default=list)  # Best match first
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Recommendations for {self.user_id}"
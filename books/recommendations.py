@@ -0,0 +1,182 @@
+"""
+"Books you may like", precomputed per user from exchange request co-occurrence.
+
+Items are Works rather than individual copies, so every copy of a title shares
+one column of the user x work interaction matrix. Scores combine item-item
+cosine similarity over that matrix with a boost for works sharing an author or
+genre with what the user asked for. Lists are stored in UserRecommendations and
+served with a primary key lookup.
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import ArchivedExchangeRequest, Book, ExchangeRequest, UserRecommendations, Work
+
+TOP_N = 50
+GENRE_CANDIDATES = 50  # Most available works considered per genre
+AUTHOR_WEIGHT = 0.5
+GENRE_WEIGHT = 0.1
+ID_CHUNK = 500  # Ids per IN (...) clause when loading part of the matrix
+
+
+class InteractionMatrix:
+    """
+    Sparse user x work matrix of exchange requests, held as adjacency sets both ways.
+    """
+
+    def __init__(self, pairs):
+        self.user_works = defaultdict(set)
+        self.work_users = defaultdict(set)
+        self._similar = {}
+        for user_id, work_id in pairs:
+            if work_id:
+                self.user_works[user_id].add(work_id)
+                self.work_users[work_id].add(user_id)
+
+    @classmethod
+    def load(cls, user_ids=None):
+        """
+        Load every exchange request, or only what ``recommend()`` reads for ``user_ids``:
+        all requests for the works co-requested with theirs.
+        """
+        if user_ids is None:
+            return cls(_request_pairs())
+        works = {work_id for _, work_id in _request_pairs('sender_id__in', user_ids)}
+        neighbours = {user_id for user_id, _ in _request_pairs('book__work_id__in', works)}
+        co_works = {work_id for _, work_id in _request_pairs('sender_id__in', neighbours)}
+        return cls(_request_pairs('book__work_id__in', co_works))
+
+    def similar_works(self, work_id):
+        """
+        Cosine similarity between the column of ``work_id`` and every work co-requested with it.
+        """
+        similar = self._similar.get(work_id)
+        if similar is None:
+            users = self.work_users[work_id]
+            co_counts = Counter()
+            for user_id in users:
+                co_counts.update(self.user_works[user_id])
+            del co_counts[work_id]
+            similar = self._similar[work_id] = {
+                other: count / math.sqrt(len(users) * len(self.work_users[other]))
+                for other, count in co_counts.items()
+            }
+        return similar
+
+
+def _request_pairs(lookup=None, values=()):
+    """
+    Yield ``(sender_id, work_id)`` of live and archived exchange requests,
+    all of them or those whose ``lookup`` is in ``values``.
+    """
+    values = sorted(value for value in values if value is not None)
+    for model in (ExchangeRequest, ArchivedExchangeRequest):
+        queryset = model.objects.values_list('sender_id', 'book__work_id')
+        if lookup is None:
+            yield from queryset.iterator()
+            continue
+        for start in range(0, len(values), ID_CHUNK):
+            yield from queryset.filter(**{lookup: values[start:start + ID_CHUNK]}).iterator()
+
+
+def requested_works(user_id):
+    """
+    Ids of the works ``user_id`` has sent exchange requests for.
+    """
+    return {work_id for _, work_id in _request_pairs('sender_id__in', [user_id]) if work_id}
+
+
+class ContentIndex:
+    """
+    Author and genre of every work, and the available works to suggest for each.
+    """
+
+    def __init__(self):
+        self.features = {}
+        self.available = set()
+        self.by_author = defaultdict(list)
+        self.by_genre = defaultdict(list)
+        rows = Work.objects.order_by('-available_copies').values_list(
+            'id', 'normalized_author', 'genre', 'available_copies'
+        )
+        for work_id, author, genre, available_copies in rows.iterator():
+            genre = genre.strip().lower()
+            self.features[work_id] = (author, genre)
+            if not available_copies:
+                continue
+            self.available.add(work_id)
+            self.by_author[author].append(work_id)
+            if len(self.by_genre[genre]) < GENRE_CANDIDATES:
+                self.by_genre[genre].append(work_id)
+
+
+def recommend(user_id, matrix, content, owned_works=()):
+    """
+    Return up to TOP_N work ids for ``user_id``, best first.
+    """
+    requested = matrix.user_works.get(user_id, set())
+    scores = Counter()
+    for work_id in sorted(requested):  # A fixed order, so the float sums are too
+        scores.update(matrix.similar_works(work_id))
+        author, genre = content.features.get(work_id, (None, None))
+        for other in content.by_author.get(author, ()):
+            scores[other] += AUTHOR_WEIGHT
+        for other in content.by_genre.get(genre, ()):
+            scores[other] += GENRE_WEIGHT
+    for work_id in requested | set(owned_works):
+        scores.pop(work_id, None)
+    # Ties go to the lowest id, so the order does not depend on how the matrix was loaded
+    candidates = ((score, -work_id) for work_id, score in scores.items() if work_id in content.available)
+    return [-negated_id for _, negated_id in heapq.nlargest(TOP_N, candidates)]
+
+
+def refresh_recommendations(full=False, batch_size=500):
+    """
+    Recompute the stored lists and return how many users were updated.
+
+    By default only users whose similarity scores may have moved since the
+    previous run are refreshed: everyone who requested a work co-requested with
+    one that got new requests. ``full`` recomputes every user with at least one
+    request, and also picks up works that became available since.
+    """
+    started = timezone.now()
+    last_run = UserRecommendations.objects.aggregate(last=Max('computed_at'))['last']
+    content = ContentIndex()
+
+    if full or last_run is None:
+        matrix = InteractionMatrix.load()
+        user_ids = set(matrix.user_works)
+    else:
+        # New requests change the columns of their works, hence every similarity involving them
+        changed = set(
+            ExchangeRequest.objects.filter(created_at__gte=last_run).values_list('book__work_id', flat=True)
+        )
+        requesters = {user_id for user_id, _ in _request_pairs('book__work_id__in', changed)}
+        co_works = {work_id for _, work_id in _request_pairs('sender_id__in', requesters)}
+        user_ids = {user_id for user_id, _ in _request_pairs('book__work_id__in', co_works)}
+        matrix = InteractionMatrix.load(user_ids)
+
+    user_ids = sorted(user_ids)
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        owned = defaultdict(set)
+        for user_id, work_id in Book.objects.filter(user_id__in=batch).values_list('user_id', 'work_id'):
+            owned[user_id].add(work_id)
+        UserRecommendations.objects.bulk_create(
+            [
+                UserRecommendations(
+                    user_id=user_id,
+                    work_ids=recommend(user_id, matrix, content, owned[user_id]),
+                    computed_at=started,
+                )
+                for user_id in batch
+            ],
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['work_ids', 'computed_at'],
+        )
+    return len(user_ids)
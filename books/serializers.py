@@ -1,12 +1,84 @@
 from rest_framework import serializers
-from .models import Book, ExchangeRequest
+from .models import ArchivedExchangeRequest, Book, ExchangeRequest, Work
 
 
-class BookSerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    """
+    Lets a serializer output only the fields named in ``fields=`` paths,
+    e.g. ``{'id', 'status', 'book.title'}``, and narrow its queryset to match.
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            self.restrict_fields(fields)
+
+    @staticmethod
+    def group_paths(paths):
+        # {'book.title', 'id'} -> {'book': {'title'}, 'id': set()}
+        grouped = {}
+        for path in paths:
+            name, _, rest = path.partition('.')
+            grouped.setdefault(name, set())
+            if rest:
+                grouped[name].add(rest)
+        return grouped
+
+    def restrict_fields(self, paths):
+        grouped = self.group_paths(paths)
+        for name in list(self.fields):
+            if name not in grouped:
+                self.fields.pop(name)
+            elif grouped[name] and isinstance(self.fields[name], SparseFieldsetMixin):
+                self.fields[name].restrict_fields(grouped[name])
+
+    @classmethod
+    def unknown_paths(cls, paths):
+        def known(fields, path):
+            name, _, rest = path.partition('.')
+            if name not in fields:
+                return False
+            return not rest or (isinstance(fields[name], SparseFieldsetMixin) and known(fields[name].fields, rest))
+
+        fields = cls().fields
+        return sorted(path for path in paths if not known(fields, path))
+
+    @classmethod
+    def select_columns(cls, queryset, paths):
+        """
+        Load only the columns the given paths need, joining nested serializers' models.
+        """
+        fields = cls().fields
+        columns = []
+        related = []
+        for name, nested_names in cls.group_paths(paths).items():
+            field = fields.get(name)
+            if field is None:
+                continue
+            columns.append(field.source)
+            if isinstance(field, SparseFieldsetMixin):
+                related.append(field.source)
+                nested_names = nested_names or field.fields.keys()
+                columns.extend(
+                    f'{field.source}__{field.fields[nested].source}' for nested in nested_names if nested in field.fields
+                )
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
+
+
+class BookSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Book
         fields = ['id', 'title', 'author', 'genre', 'condition', 'availability', 'location', 'user']
 
+class WorkSerializer(serializers.ModelSerializer):
+    copies_available = serializers.IntegerField(read_only=True)  # Annotated by the view
+
+    class Meta:
+        model = Work
+        fields = ['id', 'title', 'author', 'genre', 'total_copies', 'copies_available']
+
 class BookCreateUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Book
@@ -22,8 +94,15 @@ class ExchangeRequestSerializer(serializers.ModelSerializer):
 
 
 # Exchange Request Serializer
-class ExchangeRequestReadSerializer(serializers.ModelSerializer):
+class ExchangeRequestReadSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     book = BookSerializer()
     class Meta:
         model = ExchangeRequest
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+class ArchivedExchangeRequestReadSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    book = BookSerializer()
+    class Meta:
+        model = ArchivedExchangeRequest
+        fields = '__all__'
@@ -0,0 +1,76 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .autocomplete import book_autocomplete
+from .models import Book, Work, WorkLocation
+from .utils import normalize_text
+
+
+def _counted_state(work_id, availability, location):
+    # What a book row counts towards: its Work, and the location counter when available
+    return (work_id, availability, normalize_text(location) if availability else None)
+
+
+def _previous_state(book_id):
+    # Locked until the surrounding transaction ends, so concurrent saves of the
+    # same book apply their counter changes one after the other
+    row = Book.objects.select_for_update().filter(pk=book_id).values_list('work_id', 'availability', 'location').first()
+    return _counted_state(*row) if row else None
+
+
+def _count(state, amount):
+    work_id, availability, location = state
+    if not work_id:
+        return
+    Work.adjust_counters(work_id, amount, amount * int(availability))
+    if availability:
+        WorkLocation.adjust(work_id, location, amount)
+
+
+@receiver(pre_save, sender=Book)
+def assign_work(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Remember what the row counted towards before this save
+    instance._previous_counts = _previous_state(instance.pk) if instance.pk else None
+    instance.work = Work.for_book(instance)
+
+
+@receiver(post_save, sender=Book)
+def update_work_counters_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = instance.__dict__.pop('_previous_counts', None)
+    current = _counted_state(instance.work_id, instance.availability, instance.location)
+    if previous == current:
+        return
+    if previous:
+        _count(previous, -1)
+    _count(current, 1)
+
+
+@receiver(pre_delete, sender=Book)
+def lock_work_counters_on_delete(sender, instance, **kwargs):
+    # Runs inside the deletion's transaction; the row may have changed since the instance was loaded
+    instance._previous_counts = _previous_state(instance.pk)
+
+
+@receiver(post_delete, sender=Book)
+def update_work_counters_on_delete(sender, instance, **kwargs):
+    previous = instance.__dict__.pop('_previous_counts', None)
+    if previous:
+        _count(previous, -1)
+
+
+@receiver(post_save, sender=Book)
+def update_autocomplete_on_save(sender, instance, **kwargs):
+    # Values as saved, should the instance change or be deleted before the commit
+    book_id, title, author = instance.pk, instance.title, instance.author
+    transaction.on_commit(lambda: book_autocomplete.book_saved(book_id, title, author))
+
+
+@receiver(post_delete, sender=Book)
+def update_autocomplete_on_delete(sender, instance, **kwargs):
+    book_id = instance.pk  # cleared on the instance once the delete completes
+    transaction.on_commit(lambda: book_autocomplete.book_deleted(book_id))
@@ -1,3 +1,361 @@
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .autocomplete import MAX_SUGGESTIONS, BookAutocomplete, PrefixIndex, book_autocomplete
+from .models import ArchivedExchangeRequest, Book, ExchangeRequest, Work, WorkLocation
+from .serializers import BookSerializer
+from .views import MAX_BATCH_SIZE
+from .utils import normalize_text
+
+
+def make_book(user, **fields):
+    values = {'title': 'The Hobbit', 'author': 'J. R. R. Tolkien', 'genre': 'Fantasy',
+              'condition': 'good', 'location': 'Lyon', 'availability': True}
+    values.update(fields)
+    return Book.objects.create(user=user, **values)
+
+
+class BookLocationFilterTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='reader', email='reader@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_location_with_punctuation_matches_itself(self):
+        book = make_book(self.user, location='St. Louis')
+        response = self.client.get(reverse('book-list'), {'location': 'St. Louis'})
+        self.assertEqual([item['id'] for item in response.data], [book.id])
+
+    def test_dashboard_location_with_accents_matches_itself(self):
+        make_book(self.user, location='São Paulo')
+        response = self.client.get(reverse('dashboard-book-list'), {'location': 'São Paulo'})
+        self.assertEqual(response.data['count'], 1)
+
+
+class WorkCounterTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='owner', email='owner@example.com')
+
+    def assertCounters(self, work, total, available, locations):
+        work.refresh_from_db()
+        self.assertEqual((work.total_copies, work.available_copies), (total, available))
+        self.assertEqual(
+            dict(WorkLocation.objects.filter(work=work, available_copies__gt=0).values_list('location', 'available_copies')),
+            locations,
+        )
+
+    def test_create(self):
+        book = make_book(self.user, location='St. Louis')
+        make_book(self.user, title='the hobbit!', location='st louis')
+        make_book(self.user, availability=False)
+        self.assertCounters(book.work, 3, 2, {'st louis': 2})
+
+    def test_availability_flip(self):
+        book = make_book(self.user)
+        book.availability = False
+        book.save()
+        self.assertCounters(book.work, 1, 0, {})
+        book.availability = True
+        book.save()
+        self.assertCounters(book.work, 1, 1, {'lyon': 1})
+
+    def test_location_change(self):
+        book = make_book(self.user)
+        book.location = 'Nice'
+        book.save()
+        self.assertCounters(book.work, 1, 1, {'nice': 1})
+
+    def test_title_change_moves_copy_to_another_work(self):
+        book = make_book(self.user)
+        hobbit = book.work
+        book.title = 'The Silmarillion'
+        book.save()
+        self.assertNotEqual(book.work_id, hobbit.id)
+        self.assertCounters(hobbit, 0, 0, {})
+        self.assertCounters(book.work, 1, 1, {'lyon': 1})
+
+    def test_save_of_stale_instance_uses_current_row(self):
+        book = make_book(self.user)
+        stale = Book.objects.get(pk=book.pk)
+        book.availability = False
+        book.save()
+        # The stale copy still says available; the previous state must come from the row
+        stale.location = 'Nice'
+        stale.save()
+        self.assertCounters(book.work, 1, 1, {'nice': 1})
+
+    def test_delete(self):
+        book = make_book(self.user)
+        make_book(self.user)
+        stale = Book.objects.get(pk=book.pk)
+        book.availability = False
+        book.save()
+        stale.delete()
+        self.assertCounters(book.work, 1, 1, {'lyon': 1})
+
+    def test_admin_mark_unavailable_recounts(self):
+        admin_user = User.objects.create(username='admin', email='admin@example.com', is_staff=True, is_superuser=True)
+        books = [make_book(self.user), make_book(self.user, location='Nice'), make_book(self.user)]
+        self.client.force_login(admin_user)
+        response = self.client.post(reverse('admin:books_book_changelist'), {
+            'action': 'mark_unavailable',
+            '_selected_action': [books[0].pk, books[1].pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertCounters(books[0].work, 3, 1, {'lyon': 1})
+
+    def test_recount_command_repairs_drift(self):
+        book = make_book(self.user)
+        Work.objects.filter(pk=book.work_id).update(total_copies=7, available_copies=0)
+        WorkLocation.objects.all().delete()
+        call_command('recount_work_counters', stdout=StringIO())
+        self.assertCounters(book.work, 1, 1, {'lyon': 1})
+
+    def test_location_backfill_migration(self):
+        book = make_book(self.user)
+        make_book(self.user, location='Nice', availability=False)
+        WorkLocation.objects.all().delete()
+        backfill = import_module('books.migrations.0010_backfill_work_location').backfill_work_locations
+        backfill(apps, None)
+        backfill(apps, None)  # Safe to re-run
+        self.assertCounters(book.work, 2, 1, {'lyon': 1})
+
+
+class PrefixIndexTests(TestCase):
+
+    def suggestions(self, index, prefix):
+        return [(item['value'], item['count']) for item in index.suggest(prefix, MAX_SUGGESTIONS)]
+
+    def test_matches_the_start_of_any_word(self):
+        index = PrefixIndex.from_labels(['The Hobbit', 'The Hobbit', 'Hobbit Companion', 'Thehobbit'])
+        self.assertEqual(self.suggestions(index, 'hob'), [('The Hobbit', 2), ('Hobbit Companion', 1)])
+        self.assertEqual(self.suggestions(index, 'the h'), [('The Hobbit', 2)])
+        self.assertEqual(self.suggestions(index, 'bit'), [])
+
+    def test_add_and_remove_patch_cached_top_lists(self):
+        labels = [f'Book {number} of {number % 7}' for number in range(60)] * 2
+        index = PrefixIndex.from_labels(labels)
+        index.warm()
+        for prefix in ('b', 'book 1', 'of', 'of 3'):
+            index.suggest(prefix, 1)  # Cache the lists that add/remove must keep current
+        changes = [('add', 'Book 15 of 1')] * 3 + [('remove', 'Book 30 of 2')] * 2 + [('add', 'Of Mice')]
+        for operation, label in changes:
+            if operation == 'add':
+                index.add(normalize_text(label), label)
+                labels.append(label)
+            else:
+                index.remove(normalize_text(label))
+                labels.remove(label)
+        fresh = PrefixIndex.from_labels(labels)
+        for prefix in ('b', 'book 1', 'book 3', 'of', 'of 3', 'o', 'm'):
+            self.assertEqual(self.suggestions(index, prefix), self.suggestions(fresh, prefix), prefix)
+
+
+class BookAutocompleteTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='owner', email='owner@example.com')
+
+    def test_changes_during_rebuild_are_replayed(self):
+        autocomplete = BookAutocomplete()
+        kept = make_book(self.user, title='Dune', author='Frank Herbert')
+        deleted = make_book(self.user, title='Emma', author='Jane Austen')
+        warm = PrefixIndex.warm
+
+        def change_books(index):
+            # Runs after the rebuild read the books table, before the new index is swapped in
+            if index.name == 'autocomplete_titles':
+                autocomplete.book_saved(kept.pk, 'Dune Messiah', 'Frank Herbert')
+                autocomplete.book_saved(999999, 'Ulysses', 'James Joyce')
+                autocomplete.book_deleted(deleted.pk)
+            warm(index)
+
+        with mock.patch.object(PrefixIndex, 'warm', change_books):
+            autocomplete.rebuild()
+        self.assertEqual([item['value'] for item in autocomplete.suggest('d')['titles']], ['Dune Messiah'])
+        self.assertEqual([item['value'] for item in autocomplete.suggest('ulys')['titles']], ['Ulysses'])
+        self.assertEqual(autocomplete.suggest('emma')['titles'], [])
+
+    def test_signals_keep_the_index_current(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            book = make_book(self.user)
+        book_autocomplete.rebuild()
+        with self.captureOnCommitCallbacks(execute=True):
+            book.title = 'Unfinished Tales'
+            book.save()
+        self.assertEqual([item['value'] for item in book_autocomplete.suggest('tales')['titles']], ['Unfinished Tales'])
+        self.assertEqual(book_autocomplete.suggest('hobbit')['titles'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            book.delete()
+        self.assertEqual(book_autocomplete.suggest('tales')['titles'], [])
+
+
+class SparseFieldsetTests(TestCase):
+
+    def setUp(self):
+        self.sender = User.objects.create(username='sender', email='sender@example.com')
+        self.owner = User.objects.create(username='owner', email='owner@example.com')
+        self.book = make_book(self.sender)
+        self.requested = make_book(self.owner, title='Dune', author='Frank Herbert')
+        ExchangeRequest.objects.create(sender=self.sender, receiver=self.owner, book=self.requested,
+                                       delivery_method='post', exchange_duration=14)
+        self.client = APIClient()
+        self.client.force_authenticate(self.sender)
+
+    def test_fields_narrow_the_output_and_the_select_list(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('book-list'), {'fields': 'id,title'})
+        self.assertEqual(response.data, [{'id': self.book.id, 'title': 'The Hobbit'}])
+        sql = queries.captured_queries[-1]['sql']
+        self.assertIn('"books_book"."title"', sql)
+        self.assertNotIn('"books_book"."author"', sql)
+        self.assertNotIn('"books_book"."location"', sql)
+
+    def test_nested_field_is_loaded_in_the_same_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('exchange-request-list'), {'fields': 'book.title'})
+        self.assertEqual(response.data, [{'book': {'title': 'Dune'}}])
+
+    def test_nested_serializer_without_subfields_is_returned_whole(self):
+        response = self.client.get(reverse('exchange-request-list'), {'fields': 'id,book'})
+        self.assertEqual(set(response.data[0]), {'id', 'book'})
+        self.assertEqual(response.data[0]['book']['author'], 'Frank Herbert')
+        self.assertEqual(set(response.data[0]['book']), set(BookSerializer().fields))
+
+    def test_unknown_or_over_nested_paths_are_rejected(self):
+        for fields in ('id,nope', 'id.foo', 'book.title.foo', 'book.nope'):
+            response = self.client.get(reverse('exchange-request-list'), {'fields': fields})
+            self.assertEqual(response.status_code, 400, fields)
+        response = self.client.get(reverse('book-list'), {'fields': 'title.foo'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_fields_of_the_archive_only_are_rejected_with_include_archived(self):
+        for params in ({'fields': 'archived_at'}, {'fields': 'id,archived_at', 'include_archived': 'true'}):
+            response = self.client.get(reverse('exchange-request-list'), params)
+            self.assertEqual(response.status_code, 400, params)
+
+
+class ArchiveExchangeRequestsTests(TestCase):
+
+    def setUp(self):
+        self.sender = User.objects.create(username='sender', email='sender@example.com')
+        self.owner = User.objects.create(username='owner', email='owner@example.com')
+        self.book = make_book(self.owner)
+
+    def make_request(self, status, days_ago):
+        exchange_request = ExchangeRequest.objects.create(sender=self.sender, receiver=self.owner, book=self.book,
+                                                          status=status, delivery_method='post', exchange_duration=14)
+        created_at = timezone.now() - timedelta(days=days_ago)
+        ExchangeRequest.objects.filter(pk=exchange_request.pk).update(created_at=created_at)
+        exchange_request.created_at = created_at
+        return exchange_request
+
+    def archive(self):
+        call_command('archive_exchange_requests', '--days', '90', '--batch-size', '2', stdout=StringIO())
+
+    def test_moves_old_closed_requests_only(self):
+        old_closed = [self.make_request('accepted', 120), self.make_request('rejected', 100),
+                      self.make_request('accepted', 95)]
+        kept = [self.make_request('pending', 200), self.make_request('modified', 200), self.make_request('accepted', 10)]
+        self.archive()
+
+        self.assertEqual(set(ExchangeRequest.objects.values_list('id', flat=True)), {request.id for request in kept})
+        archived = {request.id: request for request in ArchivedExchangeRequest.objects.all()}
+        self.assertEqual(set(archived), {request.id for request in old_closed})
+        for request in old_closed:
+            self.assertEqual(archived[request.id].created_at, request.created_at)
+            self.assertEqual(archived[request.id].status, request.status)
+            self.assertEqual(archived[request.id].sender_id, self.sender.id)
+
+    def test_rerun_after_partial_copy_is_idempotent(self):
+        request = self.make_request('accepted', 120)
+        # An interrupted run may have archived a row without deleting it
+        ArchivedExchangeRequest.objects.create(
+            id=request.id, sender=self.sender, receiver=self.owner, book=self.book, status='accepted',
+            delivery_method='post', exchange_duration=14, created_at=request.created_at,
+        )
+        self.archive()
+        self.archive()
+        self.assertFalse(ExchangeRequest.objects.exists())
+        self.assertEqual(list(ArchivedExchangeRequest.objects.values_list('id', flat=True)), [request.id])
+
+    def test_list_includes_archived_requests_only_when_asked(self):
+        archived = self.make_request('accepted', 120)
+        live = self.make_request('pending', 1)
+        self.archive()
+        client = APIClient()
+        client.force_authenticate(self.sender)
+
+        response = client.get(reverse('exchange-request-list'))
+        self.assertEqual([item['id'] for item in response.data], [live.id])
+        response = client.get(reverse('exchange-request-list'), {'include_archived': 'true'})
+        self.assertEqual(sorted(item['id'] for item in response.data), sorted([live.id, archived.id]))
+        self.assertIn('archived_at', next(item for item in response.data if item['id'] == archived.id))
+
+
+class BatchViewTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='reader', email='reader@example.com')
+        self.other = User.objects.create(username='other', email='other@example.com')
+        self.books = [make_book(self.user, title=f'Book {number}') for number in range(3)]
+        self.others_book = make_book(self.other)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_batch(self, name, ids):
+        return self.client.get(reverse(name), {'ids': ','.join(str(pk) for pk in ids)})
+
+    def test_books_come_back_in_request_order_without_duplicates(self):
+        ids = [self.books[2].id, self.books[0].id, self.books[2].id, self.books[1].id]
+        with self.assertNumQueries(1):
+            response = self.get_batch('book-batch', ids)
+        self.assertEqual([book['id'] for book in response.data['results']],
+                         [self.books[2].id, self.books[0].id, self.books[1].id])
+        self.assertEqual(response.data['missing'], [])
+
+    def test_other_users_and_unknown_ids_are_missing(self):
+        response = self.get_batch('book-batch', [self.others_book.id, self.books[0].id, 999999])
+        self.assertEqual([book['id'] for book in response.data['results']], [self.books[0].id])
+        self.assertEqual(response.data['missing'], [self.others_book.id, 999999])
+
+    def test_invalid_ids_are_rejected(self):
+        for ids in ('1,two', '', '1.5'):
+            response = self.client.get(reverse('book-batch'), {'ids': ids})
+            self.assertEqual(response.status_code, 400, ids)
+
+    def test_at_most_max_batch_size_ids(self):
+        response = self.get_batch('book-batch', range(1, MAX_BATCH_SIZE + 1))
+        self.assertEqual(response.status_code, 200)
+        response = self.get_batch('book-batch', range(1, MAX_BATCH_SIZE + 2))
+        self.assertEqual(response.status_code, 400)
+        # Duplicates do not count towards the cap
+        response = self.get_batch('book-batch', [self.books[0].id] * (MAX_BATCH_SIZE + 1))
+        self.assertEqual(response.status_code, 200)
 
-# Create your tests here.
+    def test_exchange_requests_of_other_users_are_missing(self):
+        sent = ExchangeRequest.objects.create(sender=self.user, receiver=self.other, book=self.others_book,
+                                              delivery_method='post', exchange_duration=14)
+        received = ExchangeRequest.objects.create(sender=self.other, receiver=self.user, book=self.books[0],
+                                                  delivery_method='post', exchange_duration=14)
+        stranger = User.objects.create(username='stranger', email='stranger@example.com')
+        unrelated = ExchangeRequest.objects.create(sender=stranger, receiver=self.other, book=self.others_book,
+                                                   delivery_method='post', exchange_duration=14)
+        response = self.get_batch('exchange-request-batch', [received.id, unrelated.id, sent.id])
+        self.assertEqual([item['id'] for item in response.data['results']], [received.id, sent.id])
+        self.assertEqual(response.data['missing'], [unrelated.id])
+        self.assertEqual(self.client.get(reverse('exchange-request-batch'), {'ids': 'x'}).status_code, 400)
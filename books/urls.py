@@ -1,10 +1,15 @@
 from django.urls import path
 from .views import (BookListView, BookCreateView, BookDetailView, BookUpdateView, BookDeleteView,
                     ExchangeRequestListView, ExchangeRequestCreateView, ExchangeRequestDetailView,
-                    ExchangeRequestUpdateView, ExchangeRequestDeleteView, DashboardBookListView)
+                    ExchangeRequestUpdateView, ExchangeRequestDeleteView, DashboardBookListView,
+                    BookAutocompleteView, DashboardWorkListView, BookBatchView, ExchangeRequestBatchView,
+                    BookRecommendationView)
 
 urlpatterns = [
     path('books/', BookListView.as_view(), name='book-list'),  # Get all books with filtering
+    path('books/autocomplete/', BookAutocompleteView.as_view(), name='book-autocomplete'),  # Typeahead suggestions
+    path('books/batch/', BookBatchView.as_view(), name='book-batch'),  # Several books by id in one call
+    path('books/recommendations/', BookRecommendationView.as_view(), name='book-recommendations'),  # Books you may like
     path('books/create/', BookCreateView.as_view(), name='book-create'),  # Create a new book
     path('books/<int:pk>/', BookDetailView.as_view(), name='book-detail'),  # View details of a book
     path('books/<int:pk>/update/', BookUpdateView.as_view(), name='book-update'),  # Update a book
@@ -12,9 +17,11 @@ urlpatterns = [
     
     
     path('exchange-requests/', ExchangeRequestListView.as_view(), name='exchange-request-list'),
+    path('exchange-requests/batch/', ExchangeRequestBatchView.as_view(), name='exchange-request-batch'),
     path('exchange-requests/create/', ExchangeRequestCreateView.as_view(), name='exchange-request-create'),
     path('exchange-requests/<int:pk>/', ExchangeRequestDetailView.as_view(), name='exchange-request-detail'),
     path('exchange-requests/<int:pk>/update/', ExchangeRequestUpdateView.as_view(), name='exchange-request-update'),
     path('exchange-requests/<int:pk>/delete/', ExchangeRequestDeleteView.as_view(), name='exchange-request-delete'),
     path('dashboard/books/', DashboardBookListView.as_view(), name='dashboard-book-list'),
+    path('dashboard/works/', DashboardWorkListView.as_view(), name='dashboard-work-list'),  # Copies available per title
 ]
@@ -0,0 +1,16 @@
+import re
+import unicodedata
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(value):
+    """
+    Lowercase, strip accents and punctuation and collapse whitespace,
+    so "The  Hobbit!" and "the hobbit" compare equal.
+    """
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    value = _PUNCTUATION.sub('', value.lower())
+    return _WHITESPACE.sub(' ', value).strip()
@@ -2,23 +2,75 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from drf_spectacular.utils import extend_schema
-from .models import Book
-from .serializers import BookSerializer, BookCreateUpdateSerializer, ExchangeRequestReadSerializer
-from django.db.models import Q
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from .models import Book, Work, UserRecommendations
+from .utils import normalize_text
+from .autocomplete import book_autocomplete, MAX_SUGGESTIONS
+from .recommendations import TOP_N, requested_works
+from .serializers import (BookSerializer, BookCreateUpdateSerializer, ExchangeRequestReadSerializer, WorkSerializer,
+                          ArchivedExchangeRequestReadSerializer)
+from django.db.models import F, Min, Q
 
 from rest_framework.pagination import PageNumberPagination
 
+MAX_BATCH_SIZE = 100
+
+
+def parse_batch_ids(request):
+    """
+    Parse the comma separated ``ids`` query parameter, keeping order and dropping duplicates.
+    Returns ``(ids, error_response)``.
+    """
+    raw_ids = [value for value in request.query_params.get('ids', '').split(',') if value.strip()]
+    try:
+        ids = list(dict.fromkeys(int(value) for value in raw_ids))
+    except ValueError:
+        return None, Response({"error": "ids must be a comma separated list of integers."}, status=status.HTTP_400_BAD_REQUEST)
+    if not ids:
+        return None, Response({"error": "ids is required."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(ids) > MAX_BATCH_SIZE:
+        return None, Response({"error": f"At most {MAX_BATCH_SIZE} ids can be requested at once."}, status=status.HTTP_400_BAD_REQUEST)
+    return ids, None
+
+
+def parse_fieldset(request, *serializer_classes):
+    """
+    Parse the comma separated ``fields`` query parameter (``book.title`` for nested fields).
+    Returns ``(paths or None, error_response)``; a path must be known to every serializer
+    whose rows are listed together, so no row comes out without it.
+    """
+    paths = {path.strip() for path in request.query_params.get('fields', '').split(',') if path.strip()}
+    if not paths:
+        return None, None
+    unknown = set().union(*(serializer_class.unknown_paths(paths) for serializer_class in serializer_classes))
+    if unknown:
+        return None, Response({"error": f"Unknown fields: {', '.join(sorted(unknown))}."}, status=status.HTTP_400_BAD_REQUEST)
+    return paths, None
+
+
+FIELDS_PARAMETER = OpenApiParameter(
+    'fields', str, description="Comma separated fields to return, e.g. id,title or id,status,book.title.",
+)
+
+BATCH_PARAMETERS = [
+    OpenApiParameter('ids', str, required=True, description=f"Comma separated ids, at most {MAX_BATCH_SIZE}."),
+]
+
 class BookListView(APIView):
     permission_classes = [IsAuthenticated]
 
     @extend_schema(
+        parameters=[FIELDS_PARAMETER],
         responses={200: BookSerializer(many=True)},
     )
     def get(self, request):
         """
         List all books available for exchange, including filter options for title, author, genre, and availability.
         """
+        fields, error = parse_fieldset(request, BookSerializer)
+        if error:
+            return error
+
         books = Book.objects.filter(user=request.user)  # Only show books listed by the logged-in user
         # Search filters
         title = request.query_params.get('title', '')
@@ -36,8 +88,11 @@ class BookListView(APIView):
         if location:
             books = books.filter(location__icontains=location)
 
+        if fields:
+            books = BookSerializer.select_columns(books, fields)
+
         # Return filtered books
-        serializer = BookSerializer(books, many=True)
+        serializer = BookSerializer(books, many=True, fields=fields)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 class BookCreateView(APIView):
@@ -74,6 +129,32 @@ class BookDetailView(APIView):
         except Book.DoesNotExist:
             return Response({"error": "Book not found."}, status=status.HTTP_404_NOT_FOUND)
 
+class BookBatchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        parameters=BATCH_PARAMETERS,
+        responses={200: {"type": "object", "properties": {
+            "results": {"type": "array", "items": {"type": "object"}},
+            "missing": {"type": "array", "items": {"type": "integer"}},
+        }}},
+    )
+    def get(self, request):
+        """
+        Get several of the user's books in one call, in the order requested.
+        Ids that do not exist or belong to another user are listed in ``missing``.
+        """
+        ids, error = parse_batch_ids(request)
+        if error:
+            return error
+
+        books = Book.objects.filter(user=request.user).in_bulk(ids)
+        serializer = BookSerializer([books[pk] for pk in ids if pk in books], many=True)
+        return Response(
+            {"results": serializer.data, "missing": [pk for pk in ids if pk not in books]},
+            status=status.HTTP_200_OK,
+        )
+
 class BookUpdateView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -115,26 +196,54 @@ class BookDeleteView(APIView):
 
 
 
-from .models import ExchangeRequest, Book
+from .models import ExchangeRequest, ArchivedExchangeRequest, Book
 from .serializers import ExchangeRequestSerializer
 
 class ExchangeRequestListView(APIView):
     permission_classes = [IsAuthenticated]
 
     @extend_schema(
+        parameters=[
+            OpenApiParameter('include_archived', bool, description="Also list archived (old, closed) requests."),
+            FIELDS_PARAMETER,
+        ],
         responses={200: ExchangeRequestReadSerializer(many=True)},
     )
     def get(self, request):
         """
         List all exchange requests for the logged-in user (both incoming and outgoing).
+        Archived requests are only included with ``include_archived=true``.
         """
+        include_archived = request.query_params.get('include_archived', '').lower() in ('1', 'true', 'yes')
+        read_serializers = [ExchangeRequestReadSerializer]
+        if include_archived:
+            read_serializers.append(ArchivedExchangeRequestReadSerializer)
+        fields, error = parse_fieldset(request, *read_serializers)
+        if error:
+            return error
+
         incoming_requests = ExchangeRequest.objects.filter(receiver=request.user)
         outgoing_requests = ExchangeRequest.objects.filter(sender=request.user)
         exchange_requests = incoming_requests | outgoing_requests
+        if fields:
+            exchange_requests = ExchangeRequestReadSerializer.select_columns(exchange_requests, fields)
+        else:
+            exchange_requests = exchange_requests.select_related('book')
         
         # Serialize the exchange requests and return
-        serializer = ExchangeRequestReadSerializer(exchange_requests, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        serializer = ExchangeRequestReadSerializer(exchange_requests, many=True, fields=fields)
+        data = serializer.data
+
+        if include_archived:
+            archived_requests = ArchivedExchangeRequest.objects.filter(
+                Q(sender=request.user) | Q(receiver=request.user)
+            )
+            if fields:
+                archived_requests = ArchivedExchangeRequestReadSerializer.select_columns(archived_requests, fields)
+            else:
+                archived_requests = archived_requests.select_related('book')
+            data = data + ArchivedExchangeRequestReadSerializer(archived_requests, many=True, fields=fields).data
+        return Response(data, status=status.HTTP_200_OK)
 
 
 class ExchangeRequestCreateView(APIView):
@@ -197,6 +306,37 @@ class ExchangeRequestDetailView(APIView):
             return Response({"error": "Exchange request not found."}, status=status.HTTP_404_NOT_FOUND)
 
 
+class ExchangeRequestBatchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        parameters=BATCH_PARAMETERS,
+        responses={200: {"type": "object", "properties": {
+            "results": {"type": "array", "items": {"type": "object"}},
+            "missing": {"type": "array", "items": {"type": "integer"}},
+        }}},
+    )
+    def get(self, request):
+        """
+        Get several exchange requests in one call, in the order requested.
+        Ids that do not exist or that the user is neither sender nor receiver of are listed in ``missing``.
+        """
+        ids, error = parse_batch_ids(request)
+        if error:
+            return error
+
+        exchange_requests = ExchangeRequest.objects.filter(
+            Q(sender=request.user) | Q(receiver=request.user)
+        ).in_bulk(ids)
+        serializer = ExchangeRequestSerializer(
+            [exchange_requests[pk] for pk in ids if pk in exchange_requests], many=True
+        )
+        return Response(
+            {"results": serializer.data, "missing": [pk for pk in ids if pk not in exchange_requests]},
+            status=status.HTTP_200_OK,
+        )
+
+
 class ExchangeRequestUpdateView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -263,12 +403,17 @@ class DashboardBookListView(APIView):
         max_page_size = 100
 
     @extend_schema(
+        parameters=[FIELDS_PARAMETER],
         responses={200: BookSerializer(many=True)},
     )
     def get(self, request):
         """
         List all books available for exchange from all users, with search and pagination options.
         """
+        fields, error = parse_fieldset(request, BookSerializer)
+        if error:
+            return error
+
         books = Book.objects.all().order_by("-id")  # Fetch all books listed by users
 
         # Search filters (optional query parameters)
@@ -287,12 +432,121 @@ class DashboardBookListView(APIView):
         if location:
             books = books.filter(location__icontains=location)
 
+        if fields:
+            books = BookSerializer.select_columns(books, fields)
+
         # Paginate the results
         paginator = self.BookPagination()
         paginated_books = paginator.paginate_queryset(books, request)
 
         # Serialize the books
-        serializer = BookSerializer(paginated_books, many=True)
+        serializer = BookSerializer(paginated_books, many=True, fields=fields)
 
         # Return paginated response
-        return paginator.get_paginated_response(serializer.data)
\ No newline at end of file
+        return paginator.get_paginated_response(serializer.data)
+
+
+class BookAutocompleteView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('q', str, description="Prefix typed so far."),
+            OpenApiParameter('limit', int, description=f"Suggestions per list (max {MAX_SUGGESTIONS})."),
+        ],
+        responses={200: {"type": "object", "properties": {
+            "titles": {"type": "array", "items": {"type": "object"}},
+            "authors": {"type": "array", "items": {"type": "object"}},
+        }}},
+    )
+    def get(self, request):
+        """
+        Suggest the most common titles and authors starting with the given prefix.
+        """
+        query = request.query_params.get('q', '')
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), MAX_SUGGESTIONS)
+        except ValueError:
+            return Response({"error": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(book_autocomplete.suggest(query, limit), status=status.HTTP_200_OK)
+
+
+
+class DashboardWorkListView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('title', str, description="Title prefix."),
+            OpenApiParameter('author', str, description="Author prefix."),
+            OpenApiParameter('location', str, description="Only count copies at this location (ignoring case, accents and punctuation)."),
+        ],
+        responses={200: WorkSerializer(many=True)},
+    )
+    def get(self, request):
+        """
+        List distinct books with the number of copies available for exchange, most copies first.
+        """
+        works = Work.objects.all()
+
+        title = normalize_text(request.query_params.get('title', ''))
+        author = normalize_text(request.query_params.get('author', ''))
+        location = normalize_text(request.query_params.get('location', ''))
+
+        if title:
+            works = works.filter(normalized_title__startswith=title)
+        if author:
+            works = works.filter(normalized_author__startswith=author)
+
+        if location:
+            # Per-location counters, see WorkLocation
+            works = works.filter(locations__location=location).annotate(
+                copies_available=F('locations__available_copies')
+            )
+        else:
+            works = works.annotate(copies_available=F('available_copies'))
+        works = works.filter(copies_available__gt=0).order_by('-copies_available', 'id')
+
+        paginator = DashboardBookListView.BookPagination()
+        paginated_works = paginator.paginate_queryset(works, request)
+        serializer = WorkSerializer(paginated_works, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+
+class BookRecommendationView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        parameters=[OpenApiParameter('limit', int, description=f"Number of books (max {TOP_N}).")],
+        responses={200: BookSerializer(many=True)},
+    )
+    def get(self, request):
+        """
+        List available books from other users that the logged-in user may like,
+        from the precomputed recommendations (most available books as a fallback).
+        """
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), TOP_N)
+        except ValueError:
+            return Response({"error": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Also drops works requested since the list was computed
+        requested = requested_works(request.user.id)
+        work_ids = UserRecommendations.objects.filter(user=request.user).values_list('work_ids', flat=True).first()
+        if not work_ids:
+            work_ids = list(Work.objects.filter(available_copies__gt=0).exclude(id__in=requested)
+                            .order_by('-available_copies').values_list('id', flat=True)[:TOP_N])
+        work_ids = [work_id for work_id in work_ids if work_id not in requested]
+
+        # One available copy per work, never the user's own
+        copies = dict(
+            Book.objects.filter(work_id__in=work_ids, availability=True)
+            .exclude(user=request.user)
+            .values('work_id').annotate(book_id=Min('id')).values_list('work_id', 'book_id')
+        )
+        book_ids = [copies[work_id] for work_id in work_ids if work_id in copies][:limit]
+        books = Book.objects.in_bulk(book_ids)
+        serializer = BookSerializer([books[book_id] for book_id in book_ids], many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
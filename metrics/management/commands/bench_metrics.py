@@ -0,0 +1,42 @@
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import resolve
+
+from metrics.middleware import MetricsMiddleware
+
+
+class Command(BaseCommand):
+    help = "Measure the per-request overhead added by MetricsMiddleware."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        request = RequestFactory().get('/api/books/')
+        request.resolver_match = resolve('/api/books/')
+        response = HttpResponse()
+
+        def view(request):
+            return response
+
+        with tempfile.TemporaryDirectory() as metrics_dir, override_settings(METRICS_DIR=metrics_dir):
+            instrumented = MetricsMiddleware(view)
+            instrumented(request)  # open the store file outside of the timed loop
+            baseline = self._time(view, request, iterations)
+            measured = self._time(instrumented, request, iterations)
+
+        self.stdout.write(f"iterations:             {iterations}")
+        self.stdout.write(f"bare view:              {baseline * 1e6:.2f} us/request")
+        self.stdout.write(f"with MetricsMiddleware: {measured * 1e6:.2f} us/request")
+        self.stdout.write(f"overhead:               {(measured - baseline) * 1e6:.2f} us/request")
+
+    def _time(self, handler, request, iterations):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            handler(request)
+        return (time.perf_counter() - start) / iterations
@@ -0,0 +1,50 @@
+import time
+
+from django.db import connection
+
+from . import store
+
+# Any other method the client sends is counted as 'other', so it cannot grow the label set
+HTTP_METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'TRACE', 'CONNECT'})
+
+
+class QueryCounter:
+    """
+    Database execute wrapper counting the queries run while it is installed.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """
+    Record latency, status, query count and in-flight requests per URL name.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryCounter()
+        store.inc('http_requests_in_flight')
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(queries):
+                response = self.get_response(request)
+        finally:
+            store.inc('http_requests_in_flight', amount=-1)
+        duration = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name if match else None) or 'unmatched'
+        method = request.method if request.method in HTTP_METHODS else 'other'
+        store.inc('http_requests_total', {'view': view, 'method': method, 'status': str(response.status_code)})
+        store.observe('http_request_duration_seconds', duration, {'view': view})
+        if queries.count:
+            store.inc('db_queries_total', {'view': view}, amount=queries.count)
+        return response
@@ -0,0 +1,261 @@
+"""
+File-backed metric storage shared between worker processes.
+
+Every process writes its samples into its own mmap'd file inside
+``settings.METRICS_DIR``; the ``/metrics`` endpoint reads all of those files and
+sums them up. Wipe the directory when the service is (re)deployed.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+# Upper bounds (in seconds) of the request latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+# name -> (type, help text), in the order they are exposed.
+METRICS = {
+    'http_requests_total': ('counter', 'Total HTTP requests by URL name, method and status.'),
+    'http_request_duration_seconds': ('histogram', 'HTTP request latency by URL name.'),
+    'http_requests_in_flight': ('gauge', 'HTTP requests currently being served.'),
+    'db_queries_total': ('counter', 'Database queries executed while serving requests, by URL name.'),
+    'cache_requests_total': ('counter', 'Cache lookups by cache name and result (hit or miss).'),
+}
+
+_INITIAL_SIZE = 64 * 1024
+_HEADER_SIZE = 8
+
+
+_key_cache = {}
+
+
+def _encode_key(name, labels):
+    cache_key = (name, tuple(labels.items()))
+    key = _key_cache.get(cache_key)
+    if key is None:
+        key = _key_cache[cache_key] = json.dumps([name, sorted(labels.items())], separators=(',', ':'))
+    return key
+
+
+def _decode_key(key):
+    name, labels = json.loads(key)
+    return name, tuple(tuple(pair) for pair in labels)
+
+
+def _read_entries(data, used):
+    """
+    Yield ``(key, value, value_offset)`` for each entry of a store file.
+
+    Each entry is a 4-byte key length, the utf-8 key padded to an 8-byte
+    boundary and an 8-byte double.
+    """
+    pos = _HEADER_SIZE
+    while pos < used:
+        key_length = struct.unpack_from('i', data, pos)[0]
+        key_start = pos + 4
+        key = bytes(data[key_start:key_start + key_length]).decode('utf-8')
+        pos = key_start + key_length + (8 - (key_length + 4) % 8)
+        value = struct.unpack_from('d', data, pos)[0]
+        yield key, value, pos
+        pos += 8
+
+
+class MmapedDict:
+    """
+    A ``str -> float`` mapping backed by an mmap'd file, written by one process only.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._file = open(path, 'a+b')
+        if os.fstat(self._file.fileno()).st_size == 0:
+            self._file.truncate(_INITIAL_SIZE)
+        self._capacity = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), self._capacity)
+        self._positions = {}
+        self._used = struct.unpack_from('i', self._map, 0)[0]
+        if self._used == 0:
+            self._used = _HEADER_SIZE
+            struct.pack_into('i', self._map, 0, self._used)
+        for key, _, pos in _read_entries(self._map, self._used):
+            self._positions[key] = pos
+
+    def _init_key(self, key):
+        encoded = key.encode('utf-8')
+        padded = encoded + b' ' * (8 - (len(encoded) + 4) % 8)
+        entry = struct.pack(f'i{len(padded)}sd', len(encoded), padded, 0.0)
+        while self._used + len(entry) > self._capacity:
+            self._capacity *= 2
+            self._file.truncate(self._capacity)
+            self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), self._capacity)
+        self._map[self._used:self._used + len(entry)] = entry
+        # Publish the entry only once it is completely written.
+        self._used += len(entry)
+        struct.pack_into('i', self._map, 0, self._used)
+        self._positions[key] = self._used - 8
+
+    def increment(self, key, amount):
+        with self._lock:
+            if key not in self._positions:
+                self._init_key(key)
+            pos = self._positions[key]
+            value = struct.unpack_from('d', self._map, pos)[0]
+            struct.pack_into('d', self._map, pos, value + amount)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def _metrics_dir():
+    return Path(settings.METRICS_DIR)
+
+
+def get_store():
+    """
+    Return the store of the current process, opening a new one after a fork.
+    """
+    key = (os.getpid(), settings.METRICS_DIR)
+    store = _stores.get(key)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(key)
+            if store is None:
+                directory = _metrics_dir()
+                directory.mkdir(parents=True, exist_ok=True)
+                store = MmapedDict(directory / f'metrics_{os.getpid()}.db')
+                _stores[key] = store
+    return store
+
+
+def inc(name, labels=None, amount=1.0):
+    """
+    Add ``amount`` to a counter or gauge sample.
+    """
+    get_store().increment(_encode_key(name, labels or {}), amount)
+
+
+def observe(name, value, labels=None):
+    """
+    Record ``value`` in a histogram.
+    """
+    labels = labels or {}
+    bucket = next(bound for bound in LATENCY_BUCKETS if value <= bound)
+    store = get_store()
+    store.increment(_encode_key(f'{name}_bucket', {**labels, 'le': _format_value(bucket)}), 1.0)
+    store.increment(_encode_key(f'{name}_sum', labels), value)
+    store.increment(_encode_key(f'{name}_count', labels), 1.0)
+
+
+def record_cache_lookup(cache, hit):
+    """
+    Count a lookup in one of the application's caches.
+    """
+    inc('cache_requests_total', {'cache': cache, 'result': 'hit' if hit else 'miss'})
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect():
+    """
+    Sum the samples of every process file into ``{(name, labels): value}``.
+
+    Gauges only count processes that are still running; counters and
+    histograms keep the contribution of exited workers.
+    """
+    samples = {}
+    directory = _metrics_dir()
+    if not directory.exists():
+        return samples
+    for path in directory.glob('metrics_*.db'):
+        try:
+            pid = int(path.stem.split('_', 1)[1])
+            data = path.read_bytes()
+        except (ValueError, OSError):
+            continue
+        if len(data) < _HEADER_SIZE:
+            continue
+        alive = None
+        used = min(struct.unpack_from('i', data, 0)[0], len(data))
+        for key, value, _ in _read_entries(data, used):
+            name, labels = _decode_key(key)
+            if METRICS.get(name, ('',))[0] == 'gauge':
+                if alive is None:
+                    alive = _pid_alive(pid)
+                if not alive:
+                    continue
+            samples[(name, labels)] = samples.get((name, labels), 0.0) + value
+    return samples
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label_value(value)}"' for name, value in labels) + '}'
+
+
+def render():
+    """
+    Render the aggregated samples in the Prometheus text exposition format.
+    """
+    samples = collect()
+    lines = []
+    for metric, (kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} {kind}')
+        if kind == 'histogram':
+            lines.extend(_render_histogram(metric, samples))
+            continue
+        for (name, labels), value in sorted(samples.items()):
+            if name == metric:
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def _render_histogram(metric, samples):
+    buckets = {}
+    for (name, labels), value in samples.items():
+        if name == f'{metric}_bucket':
+            le = dict(labels)['le']
+            base = tuple(pair for pair in labels if pair[0] != 'le')
+            buckets.setdefault(base, {})[le] = value
+    lines = []
+    for labels in sorted(buckets):
+        cumulative = 0.0
+        for bound in LATENCY_BUCKETS:
+            le = _format_value(bound)
+            cumulative += buckets[labels].get(le, 0.0)
+            lines.append(f'{metric}_bucket{_format_labels(labels + (("le", le),))} {_format_value(cumulative)}')
+        for suffix in ('_sum', '_count'):
+            value = samples.get((metric + suffix, labels), 0.0)
+            lines.append(f'{metric}{suffix}{_format_labels(labels)} {_format_value(value)}')
+    return lines
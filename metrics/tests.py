@@ -0,0 +1,117 @@
+import os
+import struct
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from . import store
+
+DEAD_PID = 4194305  # Above the largest pid_max Linux allows
+
+
+class MetricsDirMixin:
+
+    def setUp(self):
+        super().setUp()
+        metrics_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(metrics_dir.cleanup)
+        self.metrics_dir = Path(metrics_dir.name)
+        settings_override = override_settings(METRICS_DIR=str(self.metrics_dir))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class MmapedDictTests(MetricsDirMixin, SimpleTestCase):
+
+    def open(self, name='metrics_1.db'):
+        mapped = store.MmapedDict(self.metrics_dir / name)
+        self.addCleanup(mapped.close)
+        return mapped
+
+    def test_values_survive_reopening_whatever_the_key_length(self):
+        mapped = self.open()
+        keys = ['k' * length for length in range(1, 20)] + ['clé é']
+        for number, key in enumerate(keys):
+            mapped.increment(key, number + 0.5)
+            mapped.increment(key, 1)
+        mapped.close()
+
+        data = (self.metrics_dir / 'metrics_1.db').read_bytes()
+        used = struct.unpack_from('i', data, 0)[0]
+        entries = list(store._read_entries(data, used))
+        self.assertEqual([key for key, _, _ in entries], keys)
+        self.assertEqual([value for _, value, _ in entries], [number + 1.5 for number in range(len(keys))])
+        self.assertTrue(all(offset % 8 == 0 for _, _, offset in entries))
+        self.assertEqual(entries[-1][2] + 8, used)
+
+        reopened = self.open()
+        reopened.increment(keys[3], 1)
+        values = {key: value for key, value, _ in store._read_entries(reopened._map, reopened._used)}
+        self.assertEqual(values[keys[3]], 5.5)
+
+    def test_file_grows_when_full(self):
+        mapped = self.open()
+        keys = [f'{number:060d}' for number in range(2000)]  # About 150 KB of entries
+        for key in keys:
+            mapped.increment(key, 2)
+        self.assertGreater(mapped._capacity, store._INITIAL_SIZE)
+        mapped.close()
+
+        reopened = self.open()
+        self.assertEqual(os.path.getsize(self.metrics_dir / 'metrics_1.db'), reopened._capacity)
+        values = {key: value for key, value, _ in store._read_entries(reopened._map, reopened._used)}
+        self.assertEqual(values, dict.fromkeys(keys, 2.0))
+
+
+class CollectTests(MetricsDirMixin, SimpleTestCase):
+    labels = {'view': 'book-list', 'method': 'GET', 'status': '200'}
+
+    def write_process_file(self, pid, requests, in_flight):
+        mapped = store.MmapedDict(self.metrics_dir / f'metrics_{pid}.db')
+        mapped.increment(store._encode_key('http_requests_total', self.labels), requests)
+        mapped.increment(store._encode_key('http_requests_in_flight', {}), in_flight)
+        mapped.close()
+
+    def test_sums_processes_and_drops_gauges_of_dead_ones(self):
+        self.write_process_file(os.getpid(), requests=3, in_flight=2)
+        self.write_process_file(DEAD_PID, requests=4, in_flight=5)
+
+        samples = store.collect()
+        self.assertEqual(samples[('http_requests_total', tuple(sorted(self.labels.items())))], 7)
+        self.assertEqual(samples[('http_requests_in_flight', ())], 2)
+
+    def test_histogram_buckets_are_cumulative(self):
+        for value in (0.003, 0.02, 0.02, 20):
+            store.observe('http_request_duration_seconds', value, {'view': 'book-list'})
+
+        lines = [line for line in store.render().splitlines()
+                 if line.startswith('http_request_duration_seconds') and 'view="book-list"' in line]
+        self.assertEqual(lines[:4], [
+            'http_request_duration_seconds_bucket{view="book-list",le="0.005"} 1',
+            'http_request_duration_seconds_bucket{view="book-list",le="0.01"} 1',
+            'http_request_duration_seconds_bucket{view="book-list",le="0.025"} 3',
+            'http_request_duration_seconds_bucket{view="book-list",le="0.05"} 3',
+        ])
+        self.assertIn('http_request_duration_seconds_bucket{view="book-list",le="10"} 3', lines)
+        self.assertIn('http_request_duration_seconds_bucket{view="book-list",le="+Inf"} 4', lines)
+        self.assertIn('http_request_duration_seconds_sum{view="book-list"} 20.043', lines)
+        self.assertIn('http_request_duration_seconds_count{view="book-list"} 4', lines)
+
+
+@override_settings(METRICS_ALLOWED_IPS=['10.0.0.5'], METRICS_TOKEN='scrape-secret')
+class MetricsViewTests(MetricsDirMixin, SimpleTestCase):
+
+    def test_other_clients_are_forbidden(self):
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.9', HTTP_X_FORWARDED_FOR='10.0.0.5')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.9', HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
+
+    def test_allowed_address_or_token(self):
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.5')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE http_requests_total counter', response.content)
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.9', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
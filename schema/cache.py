@@ -0,0 +1,146 @@
+"""
+Precomputed OpenAPI schema.
+
+The schema is generated once per code version, written to
+``settings.SCHEMA_CACHE_DIR`` and kept in memory, already encoded and gzipped,
+so serving it costs no introspection at all.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+import drf_spectacular
+import rest_framework
+from django.apps import apps
+from django.conf import settings
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+
+from metrics.store import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+RENDERERS = {
+    'yaml': OpenApiYamlRenderer,
+    'json': OpenApiJsonRenderer,
+}
+
+_lock = threading.Lock()
+_version = None
+_encoded = {}
+
+
+class EncodedSchema:
+    """
+    One rendering of the schema, ready to be written to a response.
+    """
+
+    def __init__(self, body, content_type):
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=9)
+        self.content_type = content_type
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gzip"'
+
+
+def code_version():
+    """
+    Hash of the project sources and the schema tooling versions.
+
+    Computed once per process; set ``SCHEMA_VERSION`` to override it, e.g.
+    with the deployed git revision.
+    """
+    global _version
+    if _version is None:
+        version = getattr(settings, 'SCHEMA_VERSION', None)
+        if not version:
+            digest = hashlib.sha256(f'{drf_spectacular.__version__}:{rest_framework.VERSION}'.encode())
+            base_dir = Path(settings.BASE_DIR).resolve()
+            for app_config in apps.get_app_configs():
+                app_path = Path(app_config.path).resolve()
+                if base_dir not in app_path.parents:
+                    continue
+                for source in sorted(app_path.rglob('*.py')):
+                    if 'migrations' not in source.parts:
+                        digest.update(source.read_bytes())
+            for module in (settings.ROOT_URLCONF, settings.SETTINGS_MODULE):
+                source = base_dir / (module.replace('.', '/') + '.py')
+                if source.exists():
+                    digest.update(source.read_bytes())
+            version = digest.hexdigest()[:16]
+        _version = version
+    return _version
+
+
+def _schema_path():
+    return Path(settings.SCHEMA_CACHE_DIR) / f'openapi-{code_version()}.json'
+
+
+def generate_schema():
+    """
+    Introspect every view and return the OpenAPI document.
+    """
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    return generator.get_schema(request=None, public=True)
+
+
+def write_schema(schema):
+    """
+    Store ``schema`` on disk for the current code version.
+    """
+    path = _schema_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # A temporary file of our own, as several workers may write at once
+    with tempfile.NamedTemporaryFile('w', dir=path.parent, prefix=f'{path.stem}-', suffix='.tmp', delete=False) as tmp:
+        tmp_path = Path(tmp.name)
+    try:
+        tmp_path.write_text(json.dumps(schema))
+        os.replace(tmp_path, path)  # atomic, so other workers never read half a file
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return path
+
+
+def _load_schema():
+    path = _schema_path()
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        schema = generate_schema()
+        try:
+            write_schema(schema)
+        except OSError:
+            # Serving from memory still works; the next worker will try again
+            logger.warning("Could not write the OpenAPI schema to %s", path, exc_info=True)
+        return schema
+
+
+def get_encoded_schema(fmt):
+    """
+    Return the ``EncodedSchema`` for ``fmt`` ('yaml' or 'json').
+    """
+    encoded = _encoded.get(fmt)
+    record_cache_lookup('openapi_schema', encoded is not None)
+    if encoded is None:
+        with _lock:
+            if not _encoded:
+                schema = _load_schema()
+                for name, renderer_class in RENDERERS.items():
+                    renderer = renderer_class()
+                    _encoded[name] = EncodedSchema(renderer.render(schema), renderer.media_type)
+            encoded = _encoded[fmt]
+    return encoded
+
+
+def warm():
+    """
+    Load or generate the schema up front, so no request pays for it.
+    """
+    get_encoded_schema('yaml')
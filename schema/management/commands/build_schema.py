@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from schema.cache import code_version, generate_schema, write_schema
+
+
+class Command(BaseCommand):
+    help = "Generate the OpenAPI schema for the current code version and store it on disk."
+
+    def handle(self, *args, **options):
+        path = write_schema(generate_schema())
+        self.stdout.write(self.style.SUCCESS(f"Schema for version {code_version()} written to {path}"))
@@ -0,0 +1,36 @@
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from django.views import View
+
+from .cache import get_encoded_schema
+
+
+class CachedSchemaView(View):
+    """
+    Serve the precomputed OpenAPI schema with an ETag and optional gzip.
+
+    YAML by default, JSON with ``?format=json`` or a JSON ``Accept`` header.
+    """
+
+    def get(self, request):
+        fmt = request.GET.get('format')
+        if fmt not in ('yaml', 'json'):
+            fmt = 'json' if 'json' in request.headers.get('Accept', '') else 'yaml'
+        schema = get_encoded_schema(fmt)
+
+        use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+        etag = schema.gzip_etag if use_gzip else schema.etag
+
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if '*' in if_none_match or schema.etag in if_none_match or schema.gzip_etag in if_none_match:
+            response = HttpResponseNotModified()
+        elif use_gzip:
+            response = HttpResponse(schema.gzipped, content_type=schema.content_type)
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(schema.body, content_type=schema.content_type)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'  # always revalidate, the ETag makes that cheap
+        patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+        return response